@@ -0,0 +1,122 @@
+"""Find the files and lines that changed since a git revision"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import os
+import re
+import subprocess
+
+from .errors import GitError
+
+
+LineRange = Tuple[int, int]
+# Maps filenames (relative to the working directory) to the changed line
+# ranges, None means the entire file needs to be checked.
+Changes = Dict[str, Optional[List[LineRange]]]
+
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+# Escapes in quoted paths, besides octal escapes for bytes
+C_ESCAPES = {
+    'a': '\a', 'b': '\b', 't': '\t', 'n': '\n', 'v': '\v', 'f': '\f',
+    'r': '\r', '"': '"', '\\': '\\',
+}
+
+
+def changed_lines(ref: str, paths: Iterable[str]) -> Changes:
+    """Find the lines in paths that changed in the working tree since ref
+
+    Line numbers refer to the working tree files. New and untracked files,
+    as well as files with a changed header, are checked entirely.
+    """
+    paths = list(paths)
+    toplevel = _git('rev-parse', '--show-toplevel').strip()
+    changes = parse_diff(_git(
+        '-c', 'core.quotePath=false',
+        'diff', '--no-color', '--no-ext-diff', '--no-renames', '--unified=0',
+        '--src-prefix=a/', '--dst-prefix=b/',
+        ref, '--', *paths,
+    ))
+    untracked = _git(
+        'ls-files', '-z', '--others', '--exclude-standard', '--full-name', '--', *paths,
+    )
+    for filename in untracked.split('\0'):
+        if filename:
+            changes[filename] = None
+
+    return {
+        os.path.normpath(os.path.relpath(os.path.join(toplevel, filename))): ranges
+        for filename, ranges in changes.items()
+    }
+
+
+def parse_diff(diff: str) -> Changes:
+    changes: Changes = {}
+    current: Optional[str] = None
+    added = False
+    for line in diff.splitlines():
+        if line.startswith('--- '):
+            added = line == '--- /dev/null'
+        elif line.startswith('+++ '):
+            current = None
+            if line != '+++ /dev/null':
+                current = _diff_path(line[len('+++ '):])[len('b/'):]
+                changes[current] = None if added else []
+        elif line.startswith('@@') and current is not None:
+            m = HUNK_HEADER.match(line)
+            ranges = changes[current]
+            if m is None or ranges is None:
+                continue
+            old_start, old_count = _hunk_range(m.group(1), m.group(2))
+            start, count = _hunk_range(m.group(3), m.group(4))
+            if _touches_header(old_start, old_count) or _touches_header(start, count):
+                # The header changed, so every row might be affected
+                changes[current] = None
+            elif count > 0:
+                ranges.append((start, start + count - 1))
+    return changes
+
+
+def _hunk_range(start: str, count: Optional[str]) -> Tuple[int, int]:
+    return int(start), 1 if count is None else int(count)
+
+
+def _touches_header(start: int, count: int) -> bool:
+    return start <= 1 < start + count
+
+
+def _diff_path(path: str) -> str:
+    """Path from a ---/+++ line of a diff
+
+    git ends paths with spaces in a tab and puts paths with quotes,
+    backslashes or control characters in C-style quotes.
+    """
+    path = path.rstrip('\t')
+    if not (len(path) >= 2 and path.startswith('"') and path.endswith('"')):
+        return path
+
+    out = bytearray()
+    chars = iter(path[1:-1])
+    for char in chars:
+        if char != '\\':
+            out.extend(char.encode())
+            continue
+        char = next(chars, '')
+        if char and char in '01234567':
+            digits = char + next(chars, '') + next(chars, '')
+            out.append(int(digits, 8))
+        else:
+            out.extend(C_ESCAPES.get(char, char).encode())
+    return out.decode(errors='surrogateescape')
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ['git', *args],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    except FileNotFoundError:
+        raise GitError('git is not installed')
+    except subprocess.CalledProcessError as e:
+        raise GitError(f'git failed: {e.stderr.strip()}')
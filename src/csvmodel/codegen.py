@@ -0,0 +1,222 @@
+"""Generate specialized python functions for checking records against jsonschema
+
+Only the flat object schemata that make sense for csv files are supported.
+The generated function takes a record as read from the csv file and returns
+True if the record is valid. It applies the same number conversions as the
+JsonSchemaValidator, so that it accepts exactly the same records.
+"""
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import re
+
+from .errors import UnsupportedSchemaError
+
+
+# Bump this whenever the generated code changes, to invalidate cached files
+GENERATOR_VERSION = 1
+
+# Keywords that don't affect validation (jsonschema doesn't check formats by
+# default)
+ANNOTATIONS = {
+    '$schema', '$id', '$comment', 'title', 'description', 'default',
+    'examples', 'format',
+}
+OBJECT_KEYWORDS = {'type', 'properties', 'required', 'additionalProperties'}
+PROPERTY_KEYWORDS = {
+    'type', 'enum', 'const', 'pattern', 'minLength', 'maxLength',
+    'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum',
+}
+STRING_KEYWORDS = {'pattern', 'minLength', 'maxLength'}
+NUMBER_KEYWORDS = {'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum'}
+CONVERSIONS = {'number': 'float', 'integer': 'int'}
+
+CheckFunction = Callable[[Dict[str, str]], bool]
+
+
+def load_check_function(schema: Dict[str, Any],
+                        cache_dir: Optional[str] = None) -> CheckFunction:
+    """Get the check function for a schema, generating it if needed
+
+    Generated code is stored in `cache_dir` under the hash of the schema, so
+    that it (and its bytecode) can be reused across runs.
+
+    Raises UnsupportedSchemaError if the schema uses unsupported keywords.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    key = schema_hash(schema)
+    filename = os.path.join(cache_dir, f'schema_{key}.py')
+
+    if not os.path.exists(filename):
+        source = generate_source(schema)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmpname = f'{filename}.{os.getpid()}.tmp'
+            with open(tmpname, 'w') as f:
+                f.write(source)
+            os.replace(tmpname, filename)
+        except OSError:
+            # Can't cache, so just use the code directly
+            namespace: Dict[str, Any] = {}
+            exec(compile(source, '<csvmodel-generated>', 'exec'), namespace)
+            return namespace['check']
+
+    spec = importlib.util.spec_from_file_location(f'csvmodel.generated_{key}', filename)
+    if spec is None or spec.loader is None:  # pragma: no cover
+        raise UnsupportedSchemaError(f'Failed to load generated code from {filename}')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.check  # type: ignore
+
+
+def default_cache_dir() -> str:
+    if 'CSVMODEL_CACHE_DIR' in os.environ:
+        return os.environ['CSVMODEL_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base, 'csvmodel')
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    content = json.dumps([GENERATOR_VERSION, schema], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def generate_source(schema: Dict[str, Any]) -> str:
+    _check_keywords(schema, OBJECT_KEYWORDS)
+    if schema.get('type', 'object') != 'object':
+        raise UnsupportedSchemaError('Only object schemata can be compiled')
+
+    properties = schema.get('properties', {})
+    required = schema.get('required', [])
+    additional = schema.get('additionalProperties', True)
+    if not isinstance(properties, dict):
+        raise UnsupportedSchemaError('properties should be an object')
+    if not isinstance(required, list) or not all(isinstance(r, str) for r in required):
+        raise UnsupportedSchemaError('required should be a list of strings')
+    if not isinstance(additional, bool):
+        raise UnsupportedSchemaError('additionalProperties should be a boolean')
+
+    constants: List[str] = []
+    body: List[str] = []
+    for name in required:
+        body += [
+            f'    if {name!r} not in record:',
+            '        return False',
+        ]
+    if not additional:
+        constants.append(f'ALLOWED = frozenset({sorted(properties)!r})')
+        body += [
+            '    if not ALLOWED.issuperset(record):',
+            '        return False',
+        ]
+    for i, (name, subschema) in enumerate(properties.items()):
+        body += _property_lines(i, name, subschema, constants)
+
+    return '\n'.join([
+        '# Generated by csvmodel, do not edit',
+        'import re',
+        '',
+        *constants,
+        '',
+        '',
+        'def check(record):',
+        *body,
+        '    return True',
+        '',
+    ])
+
+
+def _property_lines(index: int,
+                    name: str,
+                    subschema: Dict[str, Any],
+                    constants: List[str]) -> List[str]:
+    if not isinstance(subschema, dict):
+        raise UnsupportedSchemaError(f'Schema for {name} should be an object')
+    _check_keywords(subschema, PROPERTY_KEYWORDS)
+
+    # Without a numeric type, the value stays a string
+    type_ = subschema.get('type', 'string')
+    if type_ not in ('string', 'number', 'integer'):
+        raise UnsupportedSchemaError(f'Type {type_!r} of {name} is not supported')
+
+    lines = [
+        f'    if {name!r} in record:',
+        f'        value = record[{name!r}]',
+    ]
+    if type_ in CONVERSIONS:
+        lines += [
+            '        try:',
+            f'            value = {CONVERSIONS[type_]}(value)',
+            '        except Exception:',
+            '            return False',
+        ]
+
+    conditions: List[str] = []
+    if 'enum' in subschema:
+        if not isinstance(subschema['enum'], list):
+            raise UnsupportedSchemaError(f'enum of {name} should be a list')
+        enum = tuple(_literal(value) for value in subschema['enum'])
+        constants.append(f'ENUM_{index} = {enum!r}')
+        conditions.append(f'value not in ENUM_{index}')
+    if 'const' in subschema:
+        constants.append(f'CONST_{index} = {_literal(subschema["const"])!r}')
+        conditions.append(f'value != CONST_{index}')
+
+    if type_ == 'string':
+        if 'pattern' in subschema:
+            pattern = subschema['pattern']
+            try:
+                re.compile(pattern)
+            except (TypeError, re.error):
+                raise UnsupportedSchemaError(f'Invalid pattern for {name}')
+            constants.append(f'PATTERN_{index} = re.compile({pattern!r})')
+            conditions.append(f'PATTERN_{index}.search(value) is None')
+        if 'minLength' in subschema:
+            conditions.append(f'len(value) < {_number(subschema["minLength"])!r}')
+        if 'maxLength' in subschema:
+            conditions.append(f'len(value) > {_number(subschema["maxLength"])!r}')
+    else:
+        if 'minimum' in subschema:
+            conditions.append(f'value < {_number(subschema["minimum"])!r}')
+        if 'maximum' in subschema:
+            conditions.append(f'value > {_number(subschema["maximum"])!r}')
+        if 'exclusiveMinimum' in subschema:
+            conditions.append(f'value <= {_number(subschema["exclusiveMinimum"])!r}')
+        if 'exclusiveMaximum' in subschema:
+            conditions.append(f'value >= {_number(subschema["exclusiveMaximum"])!r}')
+
+    for condition in conditions:
+        lines += [
+            f'        if {condition}:',
+            '            return False',
+        ]
+    return lines
+
+
+def _check_keywords(schema: Dict[str, Any], supported: set):
+    unsupported = set(schema) - supported - ANNOTATIONS
+    if len(unsupported):
+        raise UnsupportedSchemaError(
+            f'Unsupported keywords: {", ".join(sorted(unsupported))}'
+        )
+
+
+def _number(value: Any) -> float:
+    # Booleans are used by old drafts for exclusiveMinimum/exclusiveMaximum
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise UnsupportedSchemaError(f'Expected a number, got {value!r}')
+    if not math.isfinite(value):
+        raise UnsupportedSchemaError(f'Expected a finite number, got {value!r}')
+    return value
+
+
+def _literal(value: Any) -> Union[str, float]:
+    # Only strings and numbers compare the same in python and jsonschema
+    if isinstance(value, str):
+        return value
+    return _number(value)
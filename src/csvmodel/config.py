@@ -1,8 +1,13 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Pattern, cast
 import os
+import re
 from configparser import ConfigParser, SectionProxy
 from io import TextIOBase
-from .types import SchemaSpec
+from .types import SchemaSpec, Reference
+from .errors import ConfigError
+
+
+GLOB_CHARS = ('*', '?', '[')
 
 
 class Config:
@@ -13,9 +18,32 @@ class Config:
             'schema': '{"type": "object"}',
             'separator': ',',
             'line-limit': 'infinite',
+            'max-errors': 'infinite',
+            'read-ahead': '0',
+            'line-index': '0',
+            'unique': '',
+            'primary-key': '',
+            'unique-memory-limit': 'infinite',
+            'references': '',
+            'time-budget': 'infinite',
+            'discriminator': '',
+            'schemas': '',
         }
         if cfgfile is not None:
             self.parser.read_file(cfgfile)
+        filenames = [
+            secname[len('csvmodel:'):]
+            for secname in self.parser.sections()
+            if secname.startswith('csvmodel:')
+        ]
+        self._matcher = SectionMatcher([name for name in filenames if is_glob(name)])
+        # Exact sections by normalized filename, so that e.g. ./data/x.csv
+        # finds [csvmodel:data/x.csv]
+        self._exact: Dict[str, str] = {}
+        for name in filenames:
+            if not is_glob(name):
+                self._exact.setdefault(normalize_path(name), f'csvmodel:{name}')
+        self._resolved: Dict[str, str] = {}
 
     def add_default_options(self, **kwargs: str):
         self.parser.read_dict({'csvmodel': kwargs})
@@ -28,11 +56,71 @@ class Config:
             self._get_or_create_section(filename).get('schema')
         )
 
+    def discriminator(self, filename: str) -> Optional[str]:
+        val = self._get_or_create_section(filename).get('discriminator', fallback='')
+        return val.strip() or None
+
+    def schemas(self, filename: str) -> Dict[str, SchemaSpec]:
+        """Schemata for each value of the discriminator column"""
+        val = self._get_or_create_section(filename).get('schemas', fallback='')
+        out: Dict[str, SchemaSpec] = {}
+        for line in val.splitlines():
+            if not line.strip():
+                continue
+            value, sep, spec = line.partition('->')
+            if not sep:
+                raise ConfigError(f'Invalid schema {line.strip()!r}, use value -> schema')
+            out[value.strip()] = SchemaSpec.from_string(spec.strip())
+        return out
+
     def separator(self, filename: str) -> str:
         return self._get_or_create_section(filename).get('separator')
 
     def line_limit(self, filename: str) -> int:
-        val = self._get_or_create_section(filename).get('line-limit')
+        return self._get_limit(filename, 'line-limit')
+
+    def max_errors(self, filename: str) -> int:
+        return self._get_limit(filename, 'max-errors')
+
+    def read_ahead(self, filename: str) -> int:
+        return self._get_or_create_section(filename).getint('read-ahead', fallback=0)
+
+    def unique(self, filename: str) -> List[str]:
+        return self._get_list(filename, 'unique')
+
+    def primary_key(self, filename: str) -> List[str]:
+        return self._get_list(filename, 'primary-key')
+
+    def unique_memory_limit(self, filename: str) -> int:
+        return self._get_limit(filename, 'unique-memory-limit')
+
+    def references(self, filename: str) -> List[Reference]:
+        val = self._get_or_create_section(filename).get('references', fallback='')
+        return [
+            Reference.from_string(spec)
+            for spec in re.split('[;\n]', val)
+            if spec.strip()
+        ]
+
+    def time_budget(self, filename: str) -> Optional[float]:
+        """Time budget in seconds (None if there is no time budget)"""
+        val = self._get_or_create_section(filename).get('time-budget', fallback='inf')
+        val = val.strip().lower()
+        if val.startswith('inf'):
+            return None
+        elif val.endswith('ms'):
+            return float(val[:-2]) / 1000
+        elif val.endswith('s'):
+            return float(val[:-1])
+        else:
+            return float(val)
+
+    def _get_list(self, filename: str, key: str) -> List[str]:
+        val = self._get_or_create_section(filename).get(key, fallback='')
+        return [item.strip() for item in val.split(',') if item.strip()]
+
+    def _get_limit(self, filename: str, key: str) -> int:
+        val = self._get_or_create_section(filename).get(key)
         if val.lower().startswith('inf'):
             # This should practically be infinite, we're going to crash before
             # we get there
@@ -40,13 +128,99 @@ class Config:
         else:
             return int(val)
 
+    def line_index(self, filename: str) -> int:
+        return self._get_or_create_section(filename).getint('line-index', fallback=0)
+
     def _get_or_create_section(self, filename: str) -> SectionProxy:
-        secname = f'csvmodel:{filename}'
-        if secname not in self.parser:
-            self.parser.add_section(secname)
+        # Precedence: an exact [csvmodel:<filename>] section, then the first
+        # matching glob section (in the order of the config file), then the
+        # defaults.
+        if filename in self._resolved:
+            return self.parser[self._resolved[filename]]
+
+        normalized = normalize_path(filename)
+        if normalized in self._exact:
+            secname = self._exact[normalized]
+        else:
+            pattern = self._matcher.match(normalized)
+            if pattern is None:
+                secname = f'csvmodel:{normalized}'
+                if secname not in self.parser:
+                    self.parser.add_section(secname)
+            else:
+                secname = f'csvmodel:{pattern}'
+        self._resolved[filename] = secname
         return self.parser[secname]
 
 
+class SectionMatcher:
+    """Match filenames against a list of glob patterns
+
+    All patterns are compiled into a single regular expression. If multiple
+    patterns match, the first one wins.
+    """
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._regex: Optional[Pattern[str]] = None
+        if len(patterns):
+            self._regex = re.compile('|'.join(
+                f'(?P<p{i}>{glob_to_regex(pattern)})'
+                for i, pattern in enumerate(patterns)
+            ))
+
+    def match(self, filename: str) -> Optional[str]:
+        if self._regex is None:
+            return None
+        m = self._regex.fullmatch(normalize_path(filename))
+        if m is None:
+            return None
+        return self.patterns[int(cast(str, m.lastgroup)[1:])]
+
+
+def is_glob(name: str) -> bool:
+    return any(char in name for char in GLOB_CHARS)
+
+
+def normalize_path(filename: str) -> str:
+    return os.path.normpath(filename).replace(os.sep, '/')
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a glob pattern to a regular expression
+
+    In contrast to fnmatch, `*` and `?` do not match across directories,
+    `**/` matches any number of directories (including none), and `**`
+    matches anything.
+    """
+    pattern = normalize_path(pattern)
+    out: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith('**/', i):
+            out.append('(?:[^/]*/)*')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i+2:]:
+            j = pattern.index(']', i+2)
+            chars = pattern[i+1:j]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            out.append('[' + chars.replace('\\', '\\\\') + ']')
+            i = j + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(out)
+
+
 def find_config_file(explicit: Optional[str]) -> Optional[str]:
     options: List[str] = [
         'csvmodel.ini',
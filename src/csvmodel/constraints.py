@@ -0,0 +1,316 @@
+"""Constraints that involve multiple rows of a csv file"""
+from typing import Dict, IO, Iterable, List, Optional, Tuple
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+
+from .config import Config
+from .csvfile import CsvFile
+from .errors import ConfigError
+from .types import Reference
+
+
+# With 4 hash functions, 16 bits per key give a false positive rate of about
+# 0.2% at full capacity (and less before that)
+BLOOM_BITS_PER_KEY = 16
+# The filter takes at most as much memory as the keys kept in memory (16 bytes
+# each), i.e. it holds up to 8 spilled keys per key in memory at the above
+# rate. Beyond that, the false positive rate rises instead of the memory.
+BLOOM_KEYS_PER_MEMORY_KEY = 8
+# Minimum number of new keys that are collected before merging them into the
+# sorted arrays of a KeyStore
+MERGE_SIZE = 1024
+
+
+class Constraint(ABC):
+    """A check that keeps state across the rows of a single file"""
+    def start(self, filename: str, header: List[str]):
+        """Called with the header of the file, before the first row"""
+        pass
+
+    @abstractmethod
+    def check_row(self, lineno: int, record: Dict[str, str]) -> List[str]:
+        pass
+
+    def close(self):
+        pass
+
+
+class UniqueConstraint(Constraint):
+    """Values in the given columns should be unique
+
+    Values are only stored as 64 bit hashes, not as the original strings. For
+    primary keys, all columns need to have a value, otherwise rows with empty
+    values are ignored.
+    """
+    def __init__(self,
+                 columns: List[str],
+                 primary_key: bool = False,
+                 memory_limit: Optional[int] = None):
+        self.columns = columns
+        self.primary_key = primary_key
+        self._keys = KeyStore(memory_limit)
+
+    @property
+    def description(self) -> str:
+        if self.primary_key:
+            return f'primary key ({", ".join(self.columns)})'
+        return f'column {", ".join(self.columns)}'
+
+    def start(self, filename: str, header: List[str]):
+        _check_columns(filename, header, self.columns)
+
+    def check_row(self, lineno: int, record: Dict[str, str]) -> List[str]:
+        values = [record.get(column, '') for column in self.columns]
+        if not all(values):
+            if self.primary_key:
+                return [
+                    f'Empty value in primary key column {column}'
+                    for column, value in zip(self.columns, values)
+                    if not value
+                ]
+            return []
+
+        first = self._keys.first_seen(hash_key(values), lineno)
+        if first is not None:
+            return [f'Duplicate value for {self.description}, first seen in line {first}']
+        return []
+
+    def close(self):
+        self._keys.close()
+
+
+class KeyStore:
+    """Remember the line in which a key was first seen
+
+    Keys and lines are kept in two arrays of 64 bit integers that are sorted
+    by key. New keys first go to a small dict, which is merged into the
+    arrays once it holds more than an eighth of their keys.
+
+    Once more than memory_limit keys were seen, keys are spilled to a
+    temporary sqlite database. A Bloom filter avoids most lookups in the
+    database for keys that were not spilled. The filter is rebuilt with twice
+    the capacity once more keys were spilled than it was sized for, up to a
+    size proportional to memory_limit.
+    """
+    def __init__(self, memory_limit: Optional[int] = None):
+        self.memory_limit = memory_limit
+        self._keys = array('q')
+        self._lines = array('q')
+        self._recent: Dict[int, int] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._dbfile: Optional[IO[bytes]] = None
+        self._bloom: Optional[BloomFilter] = None
+        self._spilled = 0
+        self._capacity = 0
+
+    def __len__(self) -> int:
+        """Number of keys in memory"""
+        return len(self._keys) + len(self._recent)
+
+    def first_seen(self, key: int, lineno: int) -> Optional[int]:
+        if key in self._recent:
+            return self._recent[key]
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._lines[i]
+        if self._db is not None and self._bloom is not None and key in self._bloom:
+            row = self._db.execute(
+                'SELECT line FROM keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+
+        self._recent[key] = lineno
+        if self.memory_limit is not None and len(self) >= self.memory_limit:
+            self._spill()
+        elif len(self._recent) > max(MERGE_SIZE, len(self._keys) // 8):
+            self._merge()
+        return None
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if self._dbfile is not None:
+            self._dbfile.close()
+            self._dbfile = None
+
+    def _merge(self):
+        # Copies the runs of old keys between the new ones, which is a lot
+        # faster than going through the old keys one by one
+        keys, lines = array('q'), array('q')
+        start = 0
+        for key, lineno in sorted(self._recent.items()):
+            end = bisect_left(self._keys, key, start)
+            keys.extend(self._keys[start:end])
+            lines.extend(self._lines[start:end])
+            keys.append(key)
+            lines.append(lineno)
+            start = end
+        keys.extend(self._keys[start:])
+        lines.extend(self._lines[start:])
+        self._keys, self._lines = keys, lines
+        self._recent.clear()
+
+    def _spill(self):
+        if self._db is None:
+            self._dbfile = tempfile.NamedTemporaryFile(prefix='csvmodel', suffix='.db')
+            self._db = sqlite3.connect(self._dbfile.name)
+            self._db.execute(
+                'CREATE TABLE keys (key INTEGER PRIMARY KEY, line INTEGER) WITHOUT ROWID'
+            )
+        self._merge()
+        # Sorted keys make for fast inserts into the primary key
+        self._db.executemany(
+            'INSERT INTO keys VALUES (?, ?)', zip(self._keys, self._lines)
+        )
+        self._db.commit()
+        self._spilled += len(self._keys)
+
+        max_capacity = BLOOM_KEYS_PER_MEMORY_KEY * (self.memory_limit or 1)
+        if self._bloom is None or (
+            self._spilled > self._capacity and self._capacity < max_capacity
+        ):
+            self._capacity = min(2 * self._spilled, max_capacity)
+            self._bloom = BloomFilter(BLOOM_BITS_PER_KEY * self._capacity)
+            for (key,) in self._db.execute('SELECT key FROM keys'):
+                self._bloom.add(key)
+        else:
+            for key in self._keys:
+                self._bloom.add(key)
+        self._keys, self._lines = array('q'), array('q')
+
+
+class BloomFilter:
+    """Bloom filter for 64 bit integer keys (that are already hashes)"""
+    def __init__(self, nbits: int, nhashes: int = 4):
+        self.nbits = max(nbits, 8)
+        self.nhashes = nhashes
+        self._bits = bytearray(self.nbits // 8)
+
+    def add(self, key: int):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(key)
+        )
+
+    def _positions(self, key: int) -> List[int]:
+        # Double hashing with the two halves of the key
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) & 0xFFFFFFFF
+        size = len(self._bits) * 8
+        return [(h1 + i * h2) % size for i in range(self.nhashes)]
+
+
+class ForeignKeyConstraint(Constraint):
+    """Values in a column should exist in a column of another file
+
+    Empty values are ignored.
+    """
+    def __init__(self, reference: Reference, index: 'ReferenceIndex'):
+        self.reference = reference
+        self._index = index
+
+    def start(self, filename: str, header: List[str]):
+        _check_columns(filename, header, [self.reference.column])
+
+    def check_row(self, lineno: int, record: Dict[str, str]) -> List[str]:
+        value = record.get(self.reference.column, '')
+        if value and hash_key([value]) not in self._index:
+            return [
+                f'Value {value!r} of column {self.reference.column} not found in '
+                f'column {self.reference.target_column} of {self.reference.target}'
+            ]
+        return []
+
+
+class ReferenceIndex:
+    """Hashes of all values in a column, as a sorted array of 64 bit integers"""
+    def __init__(self, keys: Iterable[int]):
+        self._keys = array('q', sorted(set(keys)))
+
+    @classmethod
+    def from_file(cls, infile: CsvFile, column: str) -> 'ReferenceIndex':
+        rows = infile.iter_rows()
+        header = next(rows, [])
+        if column not in header:
+            raise ConfigError(f'No column {column} in {infile.filename}')
+        pos = header.index(column)
+        return cls(
+            hash_key([row[pos]])
+            for row in rows
+            if len(row) > pos and row[pos]
+        )
+
+    def __contains__(self, key: int) -> bool:
+        i = bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class ReferenceIndexes:
+    """Build every referenced index once and share it across files
+
+    Indexes are built when they are first needed, so the order in which files
+    are checked doesn't matter.
+    """
+    def __init__(self, config: Config):
+        self.config = config
+        self._indexes: Dict[Tuple[str, str], ReferenceIndex] = {}
+
+    def get(self, target: str, column: str) -> ReferenceIndex:
+        key = (os.path.normpath(target), column)
+        if key not in self._indexes:
+            if not os.path.exists(target):
+                raise ConfigError(f'Referenced file {target} not found')
+            self._indexes[key] = ReferenceIndex.from_file(
+                CsvFile(target, self.config.separator(target)),
+                column,
+            )
+        return self._indexes[key]
+
+
+def _check_columns(filename: str, header: List[str], columns: List[str]):
+    for column in columns:
+        if column not in header:
+            raise ConfigError(f'No column {column} in {filename}')
+
+
+def hash_key(values: List[str]) -> int:
+    digest = hashlib.blake2b('\x1f'.join(values).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def constraints_for(config: Config,
+                    filename: str,
+                    indexes: Optional[ReferenceIndexes] = None) -> List[Constraint]:
+    """Create fresh constraints for checking a file"""
+    memory_limit = config.unique_memory_limit(filename)
+    constraints: List[Constraint] = [
+        UniqueConstraint([column], memory_limit=memory_limit)
+        for column in config.unique(filename)
+    ]
+    primary_key = config.primary_key(filename)
+    if len(primary_key):
+        constraints.append(
+            UniqueConstraint(primary_key, primary_key=True, memory_limit=memory_limit)
+        )
+    references = config.references(filename)
+    if len(references):
+        if indexes is None:
+            indexes = ReferenceIndexes(config)
+        for reference in references:
+            index = indexes.get(reference.target, reference.target_column)
+            constraints.append(ForeignKeyConstraint(reference, index))
+    return constraints
@@ -1,15 +1,258 @@
-from typing import Iterator, List
+from typing import IO, Generator, Iterator, Iterable, List, Optional, Tuple, Union
+from array import array
+import io
+import itertools
+import locale
+import os
+import queue
+import struct
+import threading
+
+
+BATCH_SIZE = 1000
+# The encoding that open() would use by default, also used to count the bytes
+# of each row for the line index
+ENCODING = locale.getpreferredencoding(False)
+
+Batch = List[List[str]]
 
 
 class CsvFile:
     filename: str
     separator: str
+    read_ahead: int
+    batch_size: int
+    index_step: int
 
-    def __init__(self, filename: str, separator: str = ','):
+    def __init__(self,
+                 filename: str,
+                 separator: str = ',',
+                 read_ahead: int = 0,
+                 batch_size: int = BATCH_SIZE,
+                 index_step: int = 0):
         self.filename = filename
         self.separator = separator
+        self.read_ahead = read_ahead
+        self.batch_size = batch_size
+        self.index_step = index_step
+
+    def iter_rows(self) -> Generator[List[str], None, None]:
+        if self.read_ahead > 0:
+            yield from self._iter_rows_pipelined()
+        else:
+            yield from self._iter_rows()
+
+    def iter_range(self, start: int, stop: Optional[int] = None) -> Iterator[List[str]]:
+        """Rows from start up to (excluding) stop, row 0 is the header
+
+        Uses the line index to seek to start if there is a valid one.
+        """
+        index = LineIndex.load(self.filename)
+        if index is None:
+            yield from itertools.islice(self.iter_rows(), start, stop)
+            return
+
+        offset, skip = index.locate(start)
+        with open(self.filename, 'rb') as raw:
+            raw.seek(offset)
+            count = None if stop is None else skip + max(stop - start, 0)
+            with self._text(raw) as f:
+                for row in itertools.islice(f, skip, count):
+                    yield self._split(row)
+
+    def header(self) -> List[str]:
+        return next(self.iter_range(0, 1), [])
+
+    def _iter_rows(self) -> Iterator[List[str]]:
+        if self.index_step > 0:
+            if not LineIndex.is_current(self.filename, self.index_step):
+                yield from self._iter_rows_indexing()
+                return
 
-    def iter_rows(self) -> Iterator[List[str]]:
-        with open(self.filename) as f:
+        with self._open() as f:
             for row in f:
-                yield row.strip().split(self.separator)
+                yield self._split(row)
+
+    def _iter_rows_indexing(self) -> Iterator[List[str]]:
+        # Same as _iter_rows, but keeps track of byte offsets to write the
+        # line index once we reach the end of the file
+        stat = os.stat(self.filename)
+        offsets = array('q')
+        offset = 0
+        with self._open() as f:
+            for i, row in enumerate(f):
+                if i % self.index_step == 0:
+                    offsets.append(offset)
+                # ASCII characters take one byte in any locale encoding
+                offset += len(row) if row.isascii() else len(row.encode(ENCODING))
+                yield self._split(row)
+        index = LineIndex(self.index_step, stat.st_size, stat.st_mtime_ns, offsets)
+        index.save(self.filename)
+
+    def _open(self) -> IO[str]:
+        # Universal newlines (\n, \r\n or \r), but rows keep their line
+        # endings, so that we can count their bytes for the line index
+        return open(self.filename, encoding=ENCODING, newline='')
+
+    @staticmethod
+    def _text(raw: IO[bytes]) -> IO[str]:
+        # Reads a binary file exactly like _open
+        return io.TextIOWrapper(raw, encoding=ENCODING, newline='')
+
+    def _split(self, row: str) -> List[str]:
+        return row.strip().split(self.separator)
+
+    def _iter_batches(self) -> Iterator[Batch]:
+        batch: Batch = []
+        for row in self._iter_rows():
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if len(batch):
+            yield batch
+
+    def _iter_rows_pipelined(self) -> Iterator[List[str]]:
+        # A background thread reads and splits batches of rows, while the
+        # caller consumes them. The queue is bounded, so that the reader can
+        # never be more than `read_ahead` batches ahead.
+        batches: 'queue.Queue[Union[Batch, _ReaderDone]]' = queue.Queue(
+            maxsize=self.read_ahead,
+        )
+        stop = threading.Event()
+        reader = threading.Thread(
+            target=self._fill_queue,
+            args=(batches, stop),
+            daemon=True,
+        )
+        reader.start()
+        try:
+            while True:
+                item = batches.get()
+                if isinstance(item, _ReaderDone):
+                    if item.error is not None:
+                        raise item.error
+                    return
+                yield from item
+        finally:
+            # Unblocks the reader if we stop early (e.g. due to a line limit)
+            stop.set()
+            reader.join()
+
+    def _fill_queue(self,
+                    batches: 'queue.Queue[Union[Batch, _ReaderDone]]',
+                    stop: threading.Event):
+        try:
+            for batch in self._iter_batches():
+                if not _put(batches, batch, stop):
+                    return
+        except Exception as e:
+            _put(batches, _ReaderDone(e), stop)
+        else:
+            _put(batches, _ReaderDone(), stop)
+
+
+class _ReaderDone:
+    """Marks the end of the rows read by a background reader"""
+    def __init__(self, error: Optional[Exception] = None):
+        self.error = error
+
+
+def _put(q: 'queue.Queue', item: object, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+class LineIndex:
+    """Byte offsets of every `step`-th row of a csv file
+
+    The index is stored next to the csv file and is only valid as long as
+    the size and modification time of the csv file don't change.
+    """
+    MAGIC = b'CSVMODEL-LINE-INDEX-1\n'
+    HEADER = struct.Struct('<qqq')
+
+    def __init__(self, step: int, size: int, mtime_ns: int, offsets: 'array[int]'):
+        self.step = step
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.offsets = offsets
+
+    @staticmethod
+    def sidecar(filename: str) -> str:
+        dirname, basename = os.path.split(filename)
+        return os.path.join(dirname, f'.{basename}.csvmodel-index')
+
+    @classmethod
+    def load(cls, filename: str) -> Optional['LineIndex']:
+        """Load the index for filename, None if there is no valid index"""
+        try:
+            stat = os.stat(filename)
+            with open(cls.sidecar(filename), 'rb') as f:
+                if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                    return None
+                step, size, mtime_ns = cls.HEADER.unpack(f.read(cls.HEADER.size))
+                if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+                    return None
+                offsets = array('q')
+                offsets.frombytes(f.read())
+        except (OSError, struct.error, ValueError):
+            return None
+        if not len(offsets):
+            return None
+        return cls(step, size, mtime_ns, offsets)
+
+    @classmethod
+    def is_current(cls, filename: str, step: int) -> bool:
+        index = cls.load(filename)
+        return index is not None and index.step == step
+
+    def save(self, filename: str):
+        sidecar = self.sidecar(filename)
+        tmpname = f'{sidecar}.{os.getpid()}.tmp'
+        try:
+            with open(tmpname, 'wb') as f:
+                f.write(self.MAGIC)
+                f.write(self.HEADER.pack(self.step, self.size, self.mtime_ns))
+                f.write(self.offsets.tobytes())
+            os.replace(tmpname, sidecar)
+        except OSError:
+            # The index is optional, so don't fail e.g. in read only directories
+            pass
+
+    def locate(self, row: int) -> Tuple[int, int]:
+        """Byte offset to seek to and rows to skip from there to get to row"""
+        block = min(row // self.step, len(self.offsets) - 1)
+        return self.offsets[block], row - block * self.step
+
+
+def iter_filenames(paths: Iterable[str], suffix: str = '.csv') -> Iterator[str]:
+    """Expand directories to the csv files they contain
+
+    Files are passed through unchanged. Directories are walked recursively
+    (skipping hidden entries) and every file ending in `suffix` is yielded in
+    sorted order.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _walk(path, suffix)
+        else:
+            yield path
+
+
+def _walk(directory: str, suffix: str) -> Iterator[str]:
+    with os.scandir(directory) as it:
+        entries = sorted(
+            (entry for entry in it if not entry.name.startswith('.')),
+            key=lambda entry: entry.name,
+        )
+    for entry in entries:
+        if entry.is_dir():
+            yield from _walk(entry.path, suffix)
+        elif entry.name.endswith(suffix):
+            yield entry.path
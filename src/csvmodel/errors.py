@@ -6,3 +6,13 @@ class ConfigError(Exception):
 class NoSchemaError(Exception):
     """The desired schema was not found"""
     pass
+
+
+class UnsupportedSchemaError(Exception):
+    """The schema can not be compiled"""
+    pass
+
+
+class GitError(Exception):
+    """Calling git failed"""
+    pass
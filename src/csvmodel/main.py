@@ -2,6 +2,9 @@
 Usage:
     csvmodel [options] <filename> ...
 
+Directories passed as <filename> are searched recursively for files ending in
+.csv.
+
 Options:
     -c <configfile>,--config=<configfile>
         Config file to read
@@ -12,12 +15,42 @@ Options:
         Set the default validator to pydantic with a model read as specified.
         <pydanticmodel> should be a colon (:) separated tuple of filename and
         model name.
+    --read-ahead=<batches>
+        Read and split the csv file in a background thread, while validating
+        in the main thread. <batches> is the number of batches of rows that
+        can be read ahead of the validation. Use 0 (the default) to read and
+        validate sequentially.
+    --max-errors=<n>
+        Stop checking a file after <n> errors were found in it.
+    --max-total-errors=<n>
+        Stop checking after <n> errors were found across all files.
+    --fail-fast
+        Stop checking at the first error. Equivalent to --max-total-errors=1.
+    --changed-since=<ref>
+        Only check files that changed in the working tree since the git
+        revision <ref>. For files that existed at <ref>, only the changed lines
+        are checked (unless the header or a referenced file changed).
+    --time-budget=<duration>
+        Stop checking a file after <duration> (e.g. 200ms or 2s) and report
+        which lines were checked.
+    --cursor=<line>
+        Check the rows closest to line <line> first. This is useful together
+        with a time budget when running csvmodel from an editor.
+    --watch
+        Keep running and check files again when they (or their schema files)
+        are modified. Directories are watched for new csv files.
 """
+from typing import Any, Dict, List, Optional
+import os
+import time
 from docopt import docopt
-from sys import exit
-from .validator import get_validator
-from .csvfile import CsvFile
+from sys import exit, stdout, stderr
+from .validator import Validator, ValidatorCache, ErrorBudget
+from .csvfile import CsvFile, iter_filenames
 from .config import Config, find_config_file
+from .changes import Changes, changed_lines
+from .watch import Watcher
+from .constraints import ReferenceIndexes, constraints_for
 
 
 def main():
@@ -42,16 +75,149 @@ def main():
             schema=f'file:{args["--pydantic-model"]}',
         )
 
+    if args['--read-ahead']:
+        config.add_default_options(**{'read-ahead': args['--read-ahead']})
+    if args['--max-errors']:
+        config.add_default_options(**{'max-errors': args['--max-errors']})
+    if args['--time-budget']:
+        config.add_default_options(**{'time-budget': args['--time-budget']})
+    cursor = int(args['--cursor']) if args['--cursor'] else None
+
+    validators = ValidatorCache()
+    filenames = list(iter_filenames(args['<filename>']))
+    changes = None
+    if args['--changed-since']:
+        changes = changed_files(
+            config, args['--changed-since'], args['<filename>'], filenames,
+        )
+
+    exit_status = check_files(
+        config,
+        validators,
+        filenames,
+        error_budget(args),
+        changes,
+        cursor=cursor,
+    )
+
+    if args['--watch']:
+        watcher = Watcher(args['<filename>'], config, validators)
+        try:
+            while True:
+                filenames = watcher.wait()
+                try:
+                    exit_status = check_files(
+                        config,
+                        validators,
+                        filenames,
+                        error_budget(args),
+                        cursor=cursor,
+                        report_ok=True,
+                    )
+                except Exception as e:
+                    print(f'csvmodel: {e}')
+                    exit_status = 1
+                stdout.flush()
+        except KeyboardInterrupt:
+            pass
+
+    exit(exit_status)
+
+
+def error_budget(args: Dict[str, Any]) -> ErrorBudget:
+    if args['--fail-fast']:
+        return ErrorBudget(1)
+    elif args['--max-total-errors']:
+        return ErrorBudget(int(args['--max-total-errors']))
+    else:
+        return ErrorBudget()
+
+
+def changed_files(config: Config,
+                  ref: str,
+                  paths: List[str],
+                  filenames: List[str]) -> Changes:
+    """Changed lines in paths, like changed_lines
+
+    Files that refer to a changed file (through `references`) need to be
+    checked entirely, as any of their rows might refer to a removed value.
+    """
+    referrers: Dict[str, List[str]] = {}
+    for filename in filenames:
+        for reference in config.references(filename):
+            referrers.setdefault(os.path.normpath(reference.target), []).append(
+                os.path.normpath(filename)
+            )
+    changes = changed_lines(ref, [*paths, *referrers])
+    for target, users in referrers.items():
+        if target in changes:
+            for filename in users:
+                changes[filename] = None
+    return changes
+
+
+def check_files(config: Config,
+                validators: ValidatorCache,
+                filenames: List[str],
+                budget: ErrorBudget,
+                changes: Optional[Changes] = None,
+                cursor: Optional[int] = None,
+                report_ok: bool = False) -> int:
     exit_status = 0
-    for filename in args['<filename>']:
-        validator = get_validator(
-            config.validator(filename),
-            config.schema(filename),
-            config.line_limit(filename),
+    indexes = ReferenceIndexes(config)
+    for filename in filenames:
+        if budget.exhausted:
+            break
+        lines = None
+        if changes is not None:
+            if os.path.normpath(filename) not in changes:
+                continue
+            lines = changes[os.path.normpath(filename)]
+        time_budget = config.time_budget(filename)
+        deadline = None if time_budget is None else time.monotonic() + time_budget
+        discriminator = config.discriminator(filename)
+        validator: Validator
+        if discriminator is None:
+            validator = validators.get(
+                config.validator(filename),
+                config.schema(filename),
+                config.line_limit(filename),
+            )
+        else:
+            validator = validators.get_dispatch(
+                config.validator(filename),
+                discriminator,
+                config.schemas(filename),
+                config.line_limit(filename),
+            )
+        result = validator.check(
+            CsvFile(
+                filename,
+                config.separator(filename),
+                config.read_ahead(filename),
+                index_step=config.line_index(filename),
+            ),
+            config.max_errors(filename),
+            budget,
+            lines,
+            constraints_for(config, filename, indexes),
+            deadline,
+            cursor,
         )
-        result = validator.check(CsvFile(filename, config.separator(filename)))
         if not result.ok:
-            print('\n'.join(result.messages))
+            if len(result.messages):
+                print('\n'.join(result.messages))
             exit_status = 1
+        elif report_ok:
+            print(f'{filename}: ok')
+        if not result.complete:
+            if result.checked is None:
+                print(f'{filename}: time budget exhausted, no lines checked', file=stderr)
+            else:
+                start, end = result.checked
+                print(
+                    f'{filename}: time budget exhausted, checked lines {start}-{end}',
+                    file=stderr,
+                )
 
-    exit(exit_status)
+    return exit_status
@@ -1,11 +1,15 @@
-from typing import List
+from typing import List, Optional, Tuple
 from enum import Enum
 from pydantic import BaseModel
+from .errors import ConfigError
 
 
 class ValidationResult(BaseModel):
     ok: bool
     messages: List[str]
+    # Only rows in the line range `checked` were checked if not complete
+    complete: bool = True
+    checked: Optional[Tuple[int, int]] = None
 
 
 class SchemaSpecType(str, Enum):
@@ -41,3 +45,29 @@ class SchemaSpec(BaseModel):
                 type=SchemaSpecType.inline,
                 details=spec,
             )
+
+    @property
+    def source(self) -> Optional[str]:
+        """The file that the schema is read from (if any)"""
+        if self.type == SchemaSpecType.file:
+            return self.details.split(':')[0]
+        return None
+
+
+class Reference(BaseModel):
+    column: str
+    target: str
+    target_column: str
+
+    @classmethod
+    def from_string(cls, spec: str) -> 'Reference':
+        """Parse a reference like `customer_id -> customers.csv:id`"""
+        column, sep, target = spec.partition('->')
+        filename, sep2, target_column = target.rpartition(':')
+        if not sep or not sep2 or not column.strip() or not target_column.strip():
+            raise ConfigError(f'Invalid reference {spec!r}, use column -> file:column')
+        return cls(
+            column=column.strip(),
+            target=filename.strip(),
+            target_column=target_column.strip(),
+        )
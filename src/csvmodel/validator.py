@@ -1,23 +1,33 @@
-from typing import Type, List, Dict, Any, Union, cast, Tuple
+from typing import (
+    Type, List, Dict, Any, Union, cast, Tuple, Optional, Sequence, Iterator, Generator,
+)
 from types import ModuleType
 from abc import ABC, abstractmethod
+from contextlib import closing
 
 import json
 import jsonschema
 
 import os
 import random
+import threading
+import time
 import importlib
+import itertools
 import importlib.util
 import pydantic
 
-from .errors import NoSchemaError
+from . import codegen
+from .errors import NoSchemaError, UnsupportedSchemaError
 from .types import ValidationResult, SchemaSpec, SchemaSpecType
-from .csvfile import CsvFile
+from .csvfile import CsvFile, LineIndex
+from .constraints import Constraint
 from .errors import ConfigError
 
 
 INF_INT = 1_000_000_000_000_000
+# Rows before the cursor that are kept in memory at a time
+CURSOR_WINDOW = 10_000
 
 
 class Validator(ABC):
@@ -29,36 +39,238 @@ class Validator(ABC):
     def from_schema(cls, schema: SchemaSpec, line_limit: int = INF_INT) -> 'Validator':
         pass
 
-    def check(self, infile: CsvFile) -> ValidationResult:
+    def check(self,
+              infile: CsvFile,
+              max_errors: int = INF_INT,
+              budget: Optional['ErrorBudget'] = None,
+              lines: Optional[List[Tuple[int, int]]] = None,
+              constraints: Sequence[Constraint] = (),
+              deadline: Optional[float] = None,
+              cursor: Optional[int] = None,
+              ) -> ValidationResult:
+        """Check the rows of a csv file
+
+        If lines is given, only rows in these (inclusive, 1-based) line
+        ranges are checked against the schema. Constraints still see every
+        row, as e.g. a changed row can duplicate a row that didn't change.
+
+        If deadline (in terms of time.monotonic) is given, checking stops once
+        it has passed and the result reports the lines that were checked.
+        With a deadline, rows closest to cursor (a line number) are checked
+        first, unless there are constraints, which need to see the rows in
+        order.
+        """
+        try:
+            return self._check_rows(
+                infile, max_errors, budget, lines, constraints, deadline, cursor,
+            )
+        finally:
+            for constraint in constraints:
+                constraint.close()
+
+    def _check_rows(self,
+                    infile: CsvFile,
+                    max_errors: int,
+                    budget: Optional['ErrorBudget'],
+                    lines: Optional[List[Tuple[int, int]]],
+                    constraints: Sequence[Constraint],
+                    deadline: Optional[float],
+                    cursor: Optional[int],
+                    ) -> ValidationResult:
         ok: bool = True
         messages: List[Tuple[int, str]] = []
         header: List[str]
-
-        for i, content in enumerate(infile.iter_rows()):
-            if i == 0:
-                header = content
-            elif i >= self.line_limit:
-                break
-            else:
-                msg = self.check_line(dict(zip(header, content)))
-                if len(msg):
-                    ok = False
-                    messages.extend([(i, m) for m in msg])
+        ranges = sorted(lines) if lines is not None else None
+        checked: Optional[Tuple[int, int]] = None
+        complete = True
+
+        # The rows are closed explicitly (instead of whenever they are
+        # collected) when we stop early, to stop a read-ahead thread right away
+        source: Generator[Any, None, None]
+        rows: Iterator[Tuple[int, List[str]]]
+        order: Optional[CursorOrder] = None
+        if cursor is not None and deadline is not None and not len(constraints):
+            order = CursorOrder(infile, cursor - 1, self.line_limit, deadline, ranges)
+            rows = source = iter(order)
+            ranges = None
+        else:
+            source = infile.iter_rows()
+            rows = enumerate(source)
+
+        with closing(source):
+            for i, content in rows:
+                if i == 0:
+                    header = content
+                    for constraint in constraints:
+                        constraint.start(infile.filename, header)
+                elif i >= self.line_limit:
+                    break
+                elif budget is not None and budget.exhausted:
+                    break
+                elif (ranges is not None and not len(constraints)
+                      and not self._in_ranges(i + 1, ranges)):
+                    if not len(ranges):
+                        break
+                elif deadline is not None and time.monotonic() > deadline:
+                    complete = False
+                    break
+                else:
+                    record = dict(zip(header, content))
+                    if ranges is None or self._in_ranges(i + 1, ranges):
+                        msg = self.check_line(record)
+                    else:
+                        msg = []
+                    for constraint in constraints:
+                        msg = msg + constraint.check_row(i + 1, record)
+                    if checked is None:
+                        checked = (i + 1, i + 1)
+                    else:
+                        checked = (min(checked[0], i + 1), max(checked[1], i + 1))
+                    if len(msg):
+                        ok = False
+                        msg = msg[:max_errors - len(messages)]
+                        if budget is not None:
+                            msg = msg[:budget.take(len(msg))]
+                        messages.extend([(i, m) for m in msg])
+                        if len(messages) >= max_errors:
+                            break
+
+        if order is not None and not order.complete:
+            complete = False
 
         return ValidationResult(
             ok=ok,
-            messages=self.prefix(messages, infile.filename),
+            messages=self.prefix(sorted(messages, key=lambda m: m[0]), infile.filename),
+            complete=complete,
+            checked=None if complete else checked,
         )
 
     @abstractmethod
     def check_line(self, record: Dict[str, str]) -> List[str]:
         pass
 
+    @staticmethod
+    def _in_ranges(lineno: int, ranges: List[Tuple[int, int]]) -> bool:
+        # Drops ranges we moved past, so ranges should be sorted
+        while len(ranges) and ranges[0][1] < lineno:
+            ranges.pop(0)
+        return len(ranges) > 0 and ranges[0][0] <= lineno
+
     @staticmethod
     def prefix(messages: List[Tuple[int, str]], filename: str) -> List[str]:
         return [f'{filename}:{lineno+1}: {msg}' for lineno, msg in messages]
 
 
+class CursorOrder:
+    """Rows of a csv file ordered by their distance to a cursor row
+
+    The header is yielded first. Only the rows up to `window` rows before the
+    cursor are kept in memory, rows after the cursor are read as they are
+    needed. Once those are done, the rows further up are read again in chunks
+    of `window` rows. Reading stops once the deadline has passed, in which
+    case `complete` is set to False.
+    """
+    def __init__(self,
+                 infile: CsvFile,
+                 cursor: int,
+                 line_limit: int,
+                 deadline: float,
+                 ranges: Optional[List[Tuple[int, int]]] = None,
+                 window: int = CURSOR_WINDOW):
+        self.infile = infile
+        self.line_limit = line_limit
+        self.cursor = max(1, min(cursor, line_limit - 1))
+        self.deadline = deadline
+        self.ranges = ranges
+        self.window = window
+        self.complete = True
+        self._index = LineIndex.load(infile.filename)
+        # One past the last row seen so far
+        self._end = 0
+
+    def __iter__(self) -> Generator[Tuple[int, List[str]], None, None]:
+        header = next(self._rows_from(0), None)
+        if header is None:
+            return
+        yield header
+
+        lowest = max(1, self.cursor - self.window)
+        rows = self._rows_from(lowest)
+        before: List[Tuple[int, List[str]]] = []
+        for i, content in rows:
+            if i >= self.cursor:
+                rows = itertools.chain([(i, content)], rows)
+                break
+            before.append((i, content))
+
+        # Alternate between the rows after and before the cursor
+        forward = True
+        while forward or len(before):
+            if forward:
+                row = next(rows, None)
+                if row is None or row[0] >= self.line_limit:
+                    forward = False
+                elif self._selected(row[0]):
+                    yield row
+            if len(before):
+                row = before.pop()
+                lowest = row[0]
+                if self._selected(row[0]):
+                    yield row
+
+        # The file might end before the window
+        lowest = min(lowest, self._end)
+        while lowest > 1 and self.complete:
+            start = max(1, lowest - self.window)
+            chunk = list(itertools.takewhile(
+                lambda row: row[0] < lowest, self._rows_from(start)
+            ))
+            yield from (row for row in reversed(chunk) if self._selected(row[0]))
+            lowest = start
+
+    def _rows_from(self, start: int) -> Iterator[Tuple[int, List[str]]]:
+        # Starts reading at the closest indexed row before start (or at the
+        # top), so that we always see where the file ends
+        first = 0
+        if self._index is not None:
+            first = start - self._index.locate(start)[1]
+        for i, content in enumerate(self.infile.iter_range(first), first):
+            if time.monotonic() > self.deadline:
+                self.complete = False
+                return
+            self._end = max(self._end, i + 1)
+            if i >= start:
+                yield i, content
+
+    def _selected(self, i: int) -> bool:
+        return self.ranges is None or any(
+            start <= i + 1 <= end for start, end in self.ranges
+        )
+
+
+class ErrorBudget:
+    """Limit on the total number of errors reported across several checks
+
+    The budget can be shared between checks running in different threads.
+    Once it is exhausted, all checks sharing it stop reading.
+    """
+    def __init__(self, max_errors: int = INF_INT):
+        self.max_errors = max_errors
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self._count >= self.max_errors
+
+    def take(self, n: int) -> int:
+        """Claim up to n errors from the budget, return how many were granted"""
+        with self._lock:
+            granted = max(0, min(n, self.max_errors - self._count))
+            self._count += granted
+            return granted
+
+
 MixedDict = Dict[str, Union[str, float]]
 
 
@@ -124,6 +336,49 @@ class JsonSchemaValidator(Validator):
         return record_
 
 
+class CompiledJsonSchemaValidator(Validator):
+    """Check records with python code generated for the specific schema
+
+    Schemata that can not be compiled are checked by the jsonschema engine
+    instead. Messages for invalid records always come from the jsonschema
+    engine, so they are the same as for the JsonSchemaValidator.
+    """
+    name: str = 'jsonschema-compiled'
+    line_limit: int
+    _check: Optional[codegen.CheckFunction]
+
+    def __init__(self,
+                 schema: Dict[str, Any],
+                 line_limit: int,
+                 cache_dir: Optional[str] = None):
+        self._fallback = JsonSchemaValidator(schema, line_limit)
+        self.line_limit = line_limit
+        try:
+            self._check = codegen.load_check_function(schema, cache_dir)
+        except UnsupportedSchemaError:
+            self._check = None
+        else:
+            # jsonschema checks the schema itself on every call
+            jsonschema.validators.validator_for(schema).check_schema(schema)
+
+    @classmethod
+    def from_schema(cls,
+                    schema: SchemaSpec,
+                    line_limit: int = INF_INT,
+                    ) -> 'CompiledJsonSchemaValidator':
+        fallback = JsonSchemaValidator.from_schema(schema, line_limit)
+        return cls(fallback._schema, line_limit)
+
+    @property
+    def compiled(self) -> bool:
+        return self._check is not None
+
+    def check_line(self, record: Dict[str, str]) -> List[str]:
+        if self._check is not None and self._check(record):
+            return []
+        return self._fallback.check_line(record)
+
+
 class PydanticValidator(Validator):
     name: str = 'pydantic'
     line_limit: int
@@ -132,6 +387,7 @@ class PydanticValidator(Validator):
     def __init__(self, model: pydantic.BaseModel, line_limit: int):
         self._model = model
         self.line_limit = line_limit
+        self._validate_only = self._can_validate_only(model)
 
     @classmethod
     def from_schema(cls,
@@ -156,15 +412,17 @@ class PydanticValidator(Validator):
         return cls(model, line_limit)
 
     def check_line(self, record: Dict[str, str]) -> List[str]:
+        if self._validate_only:
+            # This is what the model's __init__ would do, just without
+            # creating the instance
+            _, _, error = pydantic.validate_model(self._model, record)  # type: ignore
+            return [] if error is None else self._format_errors(error)
+
         try:
             self._model(**record)
             return []
         except pydantic.ValidationError as e:
-            out: List[str] = []
-            for issue in e.errors():
-                colnames = ','.join(issue["loc"])
-                out.append(f'Issue in column {colnames}: {issue["msg"]}')
-            return out
+            return self._format_errors(e)
         except TypeError as e:
             message = e.args[0]
             if message.startswith(self._model.__name__):  # pragma: no cover
@@ -173,6 +431,25 @@ class PydanticValidator(Validator):
                 message = message[len('__init__() '):]
             return [message]
 
+    @staticmethod
+    def _format_errors(error: pydantic.ValidationError) -> List[str]:
+        out: List[str] = []
+        for issue in error.errors():
+            colnames = ','.join(issue["loc"])
+            out.append(f'Issue in column {colnames}: {issue["msg"]}')
+        return out
+
+    @staticmethod
+    def _can_validate_only(model: Any) -> bool:
+        # Only pydantic 1 models that don't customize __init__, pydantic
+        # dataclasses report missing fields differently when instantiated
+        return (
+            str(pydantic.VERSION).startswith('1.')
+            and isinstance(model, type)
+            and issubclass(model, pydantic.BaseModel)
+            and getattr(model, '__init__') is pydantic.BaseModel.__init__
+        )
+
     @staticmethod
     def _import_module(name: str) -> ModuleType:
         return importlib.import_module(name)
@@ -192,6 +469,62 @@ class PydanticValidator(Validator):
         return module
 
 
+class DispatchValidator(Validator):
+    """Check each record with the validator for its discriminator value"""
+    name: str = 'dispatch'
+    line_limit: int
+
+    def __init__(self, column: str, validators: Dict[str, Validator], line_limit: int):
+        self.column = column
+        self._validators = validators
+        self.line_limit = line_limit
+
+    @classmethod
+    def from_schema(cls,
+                    schema: SchemaSpec,
+                    line_limit: int = INF_INT,
+                    ) -> 'DispatchValidator':
+        raise ConfigError('Use the discriminator option to dispatch between schemata')
+
+    def check_line(self, record: Dict[str, str]) -> List[str]:
+        value = record.get(self.column, '')
+        validator = self._validators.get(value)
+        if validator is None:
+            return [f'No schema for {self.column} {value!r}']
+        return validator.check_line(record)
+
+
+class ValidatorCache:
+    """Reuse validators for files that share the same settings"""
+    def __init__(self):
+        self._validators: Dict[Tuple[str, SchemaSpecType, str, int], Validator] = {}
+
+    def get(self, name: str, schema: SchemaSpec, line_limit: int = INF_INT) -> Validator:
+        key = (name, schema.type, schema.details, line_limit)
+        if key not in self._validators:
+            self._validators[key] = get_validator(name, schema, line_limit)
+        return self._validators[key]
+
+    def get_dispatch(self,
+                     name: str,
+                     column: str,
+                     schemas: Dict[str, SchemaSpec],
+                     line_limit: int = INF_INT) -> DispatchValidator:
+        dispatch = {
+            value: self.get(name, schema, line_limit)
+            for value, schema in schemas.items()
+        }
+        return DispatchValidator(column, dispatch, line_limit)
+
+    def invalidate(self, source: str):
+        """Forget all validators with a schema read from source"""
+        source = os.path.normpath(source)
+        for key in list(self._validators):
+            schema = SchemaSpec(type=key[1], details=key[2])
+            if schema.source is not None and os.path.normpath(schema.source) == source:
+                del self._validators[key]
+
+
 def get_validator(name: str, schema: SchemaSpec, line_limit: int = INF_INT) -> Validator:
     item: Type[Validator]
     for item in Validator.__subclasses__():  # type: ignore
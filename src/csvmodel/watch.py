@@ -0,0 +1,86 @@
+"""Watch csv files and their schemata for changes"""
+from typing import Dict, List, Optional, Set, Tuple
+
+import os
+import time
+
+from .config import Config
+from .csvfile import iter_filenames
+from .validator import ValidatorCache
+
+
+FileState = Optional[Tuple[int, int]]
+
+
+class Watcher:
+    """Poll files, directories and schema files for modifications
+
+    Directories are searched for new csv files on every poll. Schema files
+    are taken from the `file:` schema specs of the watched csv files, and
+    referenced files from their `references`.
+    """
+    def __init__(self,
+                 paths: List[str],
+                 config: Config,
+                 validators: ValidatorCache,
+                 interval: float = 0.5):
+        self.paths = paths
+        self.config = config
+        self.validators = validators
+        self.interval = interval
+        self._state: Dict[str, FileState] = {}
+        self.poll()
+
+    def wait(self) -> List[str]:
+        """Block until some csv files need to be checked again"""
+        while True:
+            time.sleep(self.interval)
+            filenames = self.poll()
+            if len(filenames):
+                return filenames
+
+    def poll(self) -> List[str]:
+        """Find the csv files that need to be checked again
+
+        Validators for modified schema files are dropped, so that they get
+        rebuilt when they are used next.
+        """
+        files = list(iter_filenames(self.paths))
+        users: Dict[str, List[str]] = {}
+        referrers: Dict[str, List[str]] = {}
+        for filename in files:
+            schemas = [
+                self.config.schema(filename),
+                *self.config.schemas(filename).values(),
+            ]
+            for source in {schema.source for schema in schemas}:
+                if source is not None:
+                    users.setdefault(source, []).append(filename)
+            for reference in self.config.references(filename):
+                referrers.setdefault(reference.target, []).append(filename)
+
+        watched = set(files)
+        state = {path: _stat(path) for path in [*files, *users, *referrers]}
+        recheck: Set[str] = set()
+        for path, path_state in state.items():
+            if path_state is None or path_state == self._state.get(path):
+                continue
+            if path in users:
+                if path in self._state:
+                    self.validators.invalidate(path)
+                recheck.update(users[path])
+            if path in referrers:
+                recheck.update(referrers[path])
+            if path in watched:
+                recheck.add(path)
+
+        self._state = state
+        return [filename for filename in files if filename in recheck]
+
+
+def _stat(path: str) -> FileState:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
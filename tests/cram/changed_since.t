@@ -0,0 +1,59 @@
+In a git repository, we can restrict validation to what changed since a given revision.
+  $ git init -q
+  $ git config user.name test
+  $ git config user.email test@example.com
+  $ echo '{"type": "object", "properties": {"Salary": {"type": "number"}}}' > schema.json
+  $ echo "[csvmodel]"                  > csvmodel.ini
+  $ echo "schema = file:schema.json"  >> csvmodel.ini
+  $ echo "Employee,Salary"   > employees.csv
+  $ echo "Fred,50000"       >> employees.csv
+  $ echo "Tina,80k"         >> employees.csv
+  $ echo "Alfred,60000"     >> employees.csv
+  $ echo "Employee,Salary"   > managers.csv
+  $ echo "Carla,90k"        >> managers.csv
+  $ git add . && git commit -q -m initial
+
+Both files have errors, but nothing changed yet:
+  $ csvmodel --changed-since=HEAD .
+
+Now we change one line and add another one to employees.csv. Only these lines are checked, the error in line 3 is not reported:
+  $ sed -i 's/Fred,50000/Fred,50k/' employees.csv
+  $ echo "Tony,35k"         >> employees.csv
+  $ csvmodel --changed-since=HEAD .
+  ./employees.csv:2: '50k' is not of type 'number'
+  ./employees.csv:5: '35k' is not of type 'number'
+  [1]
+
+New files are checked entirely:
+  $ echo "Employee,Salary"   > interns.csv
+  $ echo "Jim,1k"           >> interns.csv
+  $ csvmodel --changed-since=HEAD interns.csv managers.csv
+  interns.csv:2: '1k' is not of type 'number'
+  [1]
+
+Constraints still see all rows, so a changed row that duplicates an unchanged one is reported:
+  $ echo "[csvmodel:employees.csv]"  >> csvmodel.ini
+  $ echo "unique = Employee"         >> csvmodel.ini
+  $ git add . && git commit -q -m update
+  $ sed -i 's/Tony,35k/Fred,35000/' employees.csv
+  $ csvmodel --changed-since=HEAD employees.csv
+  employees.csv:5: Duplicate value for column Employee, first seen in line 2
+  [1]
+
+Files that refer to a changed file are checked entirely:
+  $ echo "[csvmodel:orders.csv]"                          >> csvmodel.ini
+  $ echo "references = customer_id -> customers.csv:id"   >> csvmodel.ini
+  $ echo "id"                 > customers.csv
+  $ echo "1"                 >> customers.csv
+  $ echo "2"                 >> customers.csv
+  $ echo "id,customer_id"     > orders.csv
+  $ echo "1,1"               >> orders.csv
+  $ echo "2,2"               >> orders.csv
+  $ git add . && git commit -q -m references
+  $ sed -i '/^2$/d' customers.csv
+  $ csvmodel --changed-since=HEAD orders.csv
+  orders.csv:3: Value '2' of column customer_id not found in column id of customers.csv
+  [1]
+  $ csvmodel --changed-since=HEAD .
+  ./orders.csv:3: Value '2' of column customer_id not found in column id of customers.csv
+  [1]
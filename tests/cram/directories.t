@@ -0,0 +1,37 @@
+Directories can be passed instead of individual files. They are searched recursively for csv files and glob patterns in the config file select the settings for each of them.
+  $ mkdir -p data/2021 data/2022
+  $ echo "Employee,Salary" > data/2021/employees.csv
+  $ echo "Fred,50000" >> data/2021/employees.csv
+  $ echo "Tina,80k" >> data/2021/employees.csv
+  $ echo "Employee;Salary" > data/2022/employees.csv
+  $ echo "Fred;55000" >> data/2022/employees.csv
+  $ echo "Tina;85k" >> data/2022/employees.csv
+  $ echo "This is not a csv file" > data/README.txt
+
+  $ echo '{"type": "object", "properties": {"Salary": {"type": "number"}}}' > schema.json
+
+An exact section takes precedence over glob patterns, glob patterns are tried in the order in which they appear in the config file:
+  $ echo "[csvmodel:data/2022/employees.csv]"  > csvmodel.ini
+  $ echo "schema = file:schema.json"          >> csvmodel.ini
+  $ echo "separator = ;"                      >> csvmodel.ini
+  $ echo ""                                   >> csvmodel.ini
+  $ echo "[csvmodel:data/**/*.csv]"           >> csvmodel.ini
+  $ echo "schema = file:schema.json"          >> csvmodel.ini
+
+  $ csvmodel data
+  data/2021/employees.csv:3: '80k' is not of type 'number'
+  data/2022/employees.csv:3: '85k' is not of type 'number'
+  [1]
+
+Exact sections also apply to files found by walking a directory:
+  $ mkdir flat && cd flat
+  $ echo "Employee,Salary"   > employees.csv
+  $ echo "Tina,80k"         >> employees.csv
+  $ echo "[csvmodel:employees.csv]"    > csvmodel.ini
+  $ echo "schema = file:../schema.json" >> csvmodel.ini
+  $ csvmodel employees.csv
+  employees.csv:2: '80k' is not of type 'number'
+  [1]
+  $ csvmodel .
+  ./employees.csv:2: '80k' is not of type 'number'
+  [1]
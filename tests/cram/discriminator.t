@@ -0,0 +1,22 @@
+Some files mix different kinds of records, identified by a discriminator column. Each row is then validated against the schema for its kind.
+  $ echo "record_type,amount,reason"   > feed.csv
+  $ echo "order,19.99,"               >> feed.csv
+  $ echo "refund,5,damaged"           >> feed.csv
+  $ echo "order,12k,"                 >> feed.csv
+  $ echo "refund,5,"                  >> feed.csv
+  $ echo "return,5,"                  >> feed.csv
+
+  $ echo '{"type": "object", "properties": {"amount": {"type": "number"}}}' > order.json
+  $ echo '{"type": "object", "properties": {"amount": {"type": "number"}, "reason": {"enum": ["damaged", "lost"]}}}' > refund.json
+
+  $ echo "[csvmodel:feed.csv]"            > csvmodel.ini
+  $ echo "discriminator = record_type"   >> csvmodel.ini
+  $ echo "schemas ="                     >> csvmodel.ini
+  $ echo "    order -> file:order.json"  >> csvmodel.ini
+  $ echo "    refund -> file:refund.json" >> csvmodel.ini
+
+  $ csvmodel feed.csv
+  feed.csv:4: '12k' is not of type 'number'
+  feed.csv:5: '' is not one of ['damaged', 'lost']
+  feed.csv:6: No schema for record_type 'return'
+  [1]
@@ -50,3 +50,18 @@ Now we have two different errors: On line 5, we still have the invalid salary fr
   employees.csv:5: '15k' is not of type 'number'
   employees.csv:7: 'Salary' is a required property
   [1]
+
+Reading the file in a background thread gives the same result:
+  $ csvmodel --read-ahead=2 employees.csv
+  employees.csv:5: '15k' is not of type 'number'
+  employees.csv:7: 'Salary' is a required property
+  [1]
+
+With a time budget, csvmodel checks as many rows as it can in the given time and reports which lines were covered. With a generous budget, all lines are checked:
+  $ csvmodel --time-budget=10s --cursor=6 employees.csv
+  employees.csv:5: '15k' is not of type 'number'
+  employees.csv:7: 'Salary' is a required property
+  [1]
+
+  $ csvmodel --time-budget=0 --cursor=6 employees.csv
+  employees.csv: time budget exhausted, no lines checked
@@ -81,3 +81,51 @@ Note how this is excluding defaults (e.g. validator=jsonschema and separator=,).
   customers.csv:4: 'rand@all' does not match '^[a-z0-9.]+@[a-z0-9]+[.][a-z0-9]{1,6}'
   [1]
 
+If we only care whether there is a problem at all, we can stop at the first error. Files that come later are not checked at all:
+  $ csvmodel --fail-fast customers.csv employees.csv
+  customers.csv:2: 'atcive' is not one of ['active', 'inactive']
+  [1]
+
+We can also limit the number of errors per file or in total:
+  $ csvmodel --max-errors=1 customers.csv employees.csv
+  customers.csv:2: 'atcive' is not one of ['active', 'inactive']
+  employees.csv:4: '45k' is not of type 'number'
+  [1]
+
+  $ csvmodel --max-total-errors=2 customers.csv employees.csv
+  customers.csv:2: 'atcive' is not one of ['active', 'inactive']
+  customers.csv:3: '4838.1' is not of type 'integer'
+  [1]
+
+The compiled jsonschema validator generates python code for each schema. It reports the same messages:
+  $ export CSVMODEL_CACHE_DIR=$PWD/cache
+  $ echo "[csvmodel]"                          > csvmodel.ini
+  $ echo "validator = jsonschema-compiled"    >> csvmodel.ini
+  $ echo "[csvmodel:employees.csv]"           >> csvmodel.ini
+  $ echo "schema = file:employees.json"       >> csvmodel.ini
+  $ echo "[csvmodel:customers.csv]"           >> csvmodel.ini
+  $ echo "schema = file:customers.json"       >> csvmodel.ini
+  $ echo "separator = ;"                      >> csvmodel.ini
+  $ csvmodel customers.csv employees.csv
+  customers.csv:2: 'atcive' is not one of ['active', 'inactive']
+  customers.csv:3: '4838.1' is not of type 'integer'
+  customers.csv:4: 'rand@all' does not match '^[a-z0-9.]+@[a-z0-9]+[.][a-z0-9]{1,6}'
+  employees.csv:4: '45k' is not of type 'number'
+  [1]
+  $ ls cache | wc -l
+  2
+
+Row level schemata can not say that a column should be unique. This is done with the unique and primary-key options:
+  $ echo "Charles;charles@users.com;4884;inactive" >> customers.csv
+  $ echo "[csvmodel:customers.csv]"      > csvmodel.ini
+  $ echo "schema = file:customers.json" >> csvmodel.ini
+  $ echo "separator = ;"                >> csvmodel.ini
+  $ echo "unique = Email"               >> csvmodel.ini
+  $ echo "primary-key = Customer"       >> csvmodel.ini
+  $ csvmodel customers.csv
+  customers.csv:2: 'atcive' is not one of ['active', 'inactive']
+  customers.csv:3: '4838.1' is not of type 'integer'
+  customers.csv:4: 'rand@all' does not match '^[a-z0-9.]+@[a-z0-9]+[.][a-z0-9]{1,6}'
+  customers.csv:5: Duplicate value for column Email, first seen in line 2
+  customers.csv:5: Duplicate value for primary key (Customer), first seen in line 2
+  [1]
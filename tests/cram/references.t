@@ -0,0 +1,19 @@
+Columns can refer to columns in other files, like foreign keys in a database.
+  $ echo "id;name"       > customers.csv
+  $ echo "1;Fred"       >> customers.csv
+  $ echo "2;Tina"       >> customers.csv
+  $ echo "id,customer_id,amount"  > orders.csv
+  $ echo "1,1,20"                >> orders.csv
+  $ echo "2,3,15"                >> orders.csv
+  $ echo "3,2,10"                >> orders.csv
+  $ echo "4,,10"                 >> orders.csv
+
+  $ echo "[csvmodel:customers.csv]"                        > csvmodel.ini
+  $ echo "separator = ;"                                  >> csvmodel.ini
+  $ echo "[csvmodel:orders.csv]"                          >> csvmodel.ini
+  $ echo "references = customer_id -> customers.csv:id"   >> csvmodel.ini
+
+The referenced file does not need to be checked itself:
+  $ csvmodel orders.csv
+  orders.csv:3: Value '3' of column customer_id not found in column id of customers.csv
+  [1]
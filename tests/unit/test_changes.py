@@ -0,0 +1,159 @@
+import pytest
+
+import subprocess
+
+from csvmodel.changes import changed_lines, parse_diff
+from csvmodel.errors import GitError
+
+
+DIFF = '\n'.join([
+    'diff --git a/data/employees.csv b/data/employees.csv',
+    'index 1234567..89abcde 100644',
+    '--- a/data/employees.csv',
+    '+++ b/data/employees.csv',
+    '@@ -3 +3 @@ Fred,50000',
+    '-Tina,80000',
+    '+Tina,80k',
+    '@@ -7,0 +8,2 @@ Chris,45000',
+    '+Carla,42000',
+    '+Tony,35000',
+    '@@ -10,2 +11,0 @@ Tom,50000',
+    '-Jim,1',
+    '-Jo,2',
+    'diff --git a/header.csv b/header.csv',
+    '--- a/header.csv',
+    '+++ b/header.csv',
+    '@@ -1 +1 @@',
+    '-a,b',
+    '+a,c',
+    'diff --git a/new.csv b/new.csv',
+    'new file mode 100644',
+    '--- /dev/null',
+    '+++ b/new.csv',
+    '@@ -0,0 +1,2 @@',
+    '+a,b',
+    '+1,2',
+    'diff --git a/deleted.csv b/deleted.csv',
+    'deleted file mode 100644',
+    '--- a/deleted.csv',
+    '+++ /dev/null',
+    '@@ -1,2 +0,0 @@',
+    '-a,b',
+    '-1,2',
+])
+
+
+def test_parse_diff():
+    assert parse_diff(DIFF) == {
+        'data/employees.csv': [(3, 3), (8, 9)],
+        'header.csv': None,
+        'new.csv': None,
+    }
+
+
+def test_parse_diff_with_deleted_header():
+    diff = '\n'.join([
+        'diff --git a/x.csv b/x.csv',
+        '--- a/x.csv',
+        '+++ b/x.csv',
+        '@@ -1 +0,0 @@',
+        '-id,value',
+    ])
+    assert parse_diff(diff) == {'x.csv': None}
+
+
+def test_parse_diff_with_deleted_rows():
+    diff = '\n'.join([
+        'diff --git a/x.csv b/x.csv',
+        '--- a/x.csv',
+        '+++ b/x.csv',
+        '@@ -2,2 +1,0 @@',
+        '-1,a',
+        '-2,b',
+    ])
+    assert parse_diff(diff) == {'x.csv': []}
+
+
+def test_parse_diff_with_special_paths():
+    diff = '\n'.join([
+        'diff --git a/my data.csv b/my data.csv',
+        '--- a/my data.csv\t',
+        '+++ b/my data.csv\t',
+        '@@ -2 +2 @@',
+        '-1',
+        '+2',
+        'diff --git "a/say \\"hi\\".csv" "b/say \\"hi\\".csv"',
+        '--- "a/say \\"hi\\".csv"',
+        '+++ "b/say \\"hi\\".csv"',
+        '@@ -3 +3 @@',
+        '-1',
+        '+2',
+        'diff --git "a/tab\\there\\303\\244.csv" "b/tab\\there\\303\\244.csv"',
+        '--- /dev/null',
+        '+++ "b/tab\\there\\303\\244.csv"',
+        '@@ -0,0 +1 @@',
+        '+a',
+    ])
+    assert parse_diff(diff) == {
+        'my data.csv': [(2, 2)],
+        'say "hi".csv': [(3, 3)],
+        'tab\there\u00e4.csv': None,
+    }
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    def git(*args):
+        subprocess.run(
+            ['git', '-c', 'user.name=any', '-c', 'user.email=any@any.com', *args],
+            check=True,
+            capture_output=True,
+        )
+
+    monkeypatch.chdir(tmp_path)
+    git('init', '-q')
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'a.csv').write_text('col1\n1\n2\n3\n')
+    (tmp_path / 'data' / 'b.csv').write_text('col1\n1\n')
+    git('add', '.')
+    git('commit', '-q', '-m', 'initial')
+    return tmp_path
+
+
+def test_changed_lines_in_working_tree(repo, monkeypatch):
+    (repo / 'data' / 'a.csv').write_text('col1\n1\nx\n3\n4\n')
+    (repo / 'data' / 'c.csv').write_text('col1\n1\n')
+
+    assert changed_lines('HEAD', ['data']) == {
+        'data/a.csv': [(3, 3), (5, 5)],
+        'data/c.csv': None,
+    }
+
+    # Paths are relative to the working directory
+    monkeypatch.chdir(repo / 'data')
+    assert changed_lines('HEAD', ['.']) == {
+        'a.csv': [(3, 3), (5, 5)],
+        'c.csv': None,
+    }
+
+
+def test_changed_lines_with_spaces_in_filenames(repo):
+    (repo / 'my data.csv').write_text('col1\n1\n2\n')
+    subprocess.run(['git', 'add', 'my data.csv'], check=True)
+    subprocess.run(
+        ['git', '-c', 'user.name=any', '-c', 'user.email=any@any.com',
+         'commit', '-q', '-m', 'spaces'],
+        check=True,
+    )
+    (repo / 'my data.csv').write_text('col1\n1\nx\n')
+    (repo / 'new "data".csv').write_text('col1\n1\n')
+
+    assert changed_lines('HEAD', ['.']) == {
+        'my data.csv': [(3, 3)],
+        'new "data".csv': None,
+    }
+
+
+def test_unknown_ref(repo):
+    with pytest.raises(GitError):
+        changed_lines('does-not-exist', ['.'])
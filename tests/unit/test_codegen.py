@@ -0,0 +1,116 @@
+import pytest
+from unittest import mock
+
+import os
+
+from csvmodel import codegen
+from csvmodel.errors import UnsupportedSchemaError
+from csvmodel.validator import CompiledJsonSchemaValidator, JsonSchemaValidator
+
+
+SCHEMA = {
+    'type': 'object',
+    'title': 'Employees',
+    'properties': {
+        'Employee': {'type': 'string', 'minLength': 2, 'maxLength': 6},
+        'Email': {'type': 'string', 'pattern': '^[a-z0-9.]+@[a-z0-9]+[.][a-z]{2,6}'},
+        'Salary': {'type': 'number', 'minimum': 0, 'exclusiveMaximum': 1e6},
+        'Level': {'type': 'integer', 'maximum': 5, 'exclusiveMinimum': 0},
+        'Status': {'enum': ['active', 'inactive']},
+        'Team': {'const': 'data'},
+        'Code': {'format': 'email', 'pattern': 'x'},
+    },
+    'required': ['Employee', 'Salary'],
+    'additionalProperties': False,
+}
+
+RECORDS = [
+    {'Employee': 'Fred', 'Salary': '50000'},
+    {'Employee': 'Fred', 'Salary': '50k'},
+    {'Employee': 'F', 'Salary': '1'},
+    {'Employee': 'Frederick', 'Salary': '1'},
+    {'Salary': '1'},
+    {'Employee': 'Fred'},
+    {'Employee': 'Fred', 'Salary': '-1'},
+    {'Employee': 'Fred', 'Salary': '1e6'},
+    {'Employee': 'Fred', 'Salary': 'nan'},
+    {'Employee': 'Fred', 'Salary': '1', 'Email': 'fred@company.com'},
+    {'Employee': 'Fred', 'Salary': '1', 'Email': 'Fred@company'},
+    {'Employee': 'Fred', 'Salary': '1', 'Level': '3'},
+    {'Employee': 'Fred', 'Salary': '1', 'Level': '0'},
+    {'Employee': 'Fred', 'Salary': '1', 'Level': '6'},
+    {'Employee': 'Fred', 'Salary': '1', 'Level': '1.0'},
+    {'Employee': 'Fred', 'Salary': '1', 'Status': 'active'},
+    {'Employee': 'Fred', 'Salary': '1', 'Status': 'atcive'},
+    {'Employee': 'Fred', 'Salary': '1', 'Team': 'data'},
+    {'Employee': 'Fred', 'Salary': '1', 'Team': 'sales'},
+    {'Employee': 'Fred', 'Salary': '1', 'Code': 'x'},
+    {'Employee': 'Fred', 'Salary': '1', 'Code': 'y'},
+    {'Employee': 'Fred', 'Salary': '1', 'Other': 'y'},
+    {'Employee': 'F', 'Salary': 'a', 'Level': '9', 'Status': 'x'},
+]
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('record', RECORDS)
+def test_same_messages_as_jsonschema(record, cache_dir):
+    compiled = CompiledJsonSchemaValidator(SCHEMA, 1000, cache_dir)
+    assert compiled.compiled
+    expected = JsonSchemaValidator(SCHEMA, 1000).check_line(record)
+    assert compiled.check_line(record) == expected
+
+
+@pytest.mark.parametrize('record', RECORDS)
+def test_check_function_agrees_with_jsonschema(record, cache_dir):
+    check = codegen.load_check_function(SCHEMA, cache_dir)
+    expected = JsonSchemaValidator(SCHEMA, 1000).check_line(record)
+    assert check(record) == (expected == [])
+
+
+@pytest.mark.parametrize('schema', [
+    {'type': 'array'},
+    {'type': 'object', 'patternProperties': {}},
+    {'properties': {'a': {'type': 'boolean'}}},
+    {'properties': {'a': {'type': ['string', 'number']}}},
+    {'properties': {'a': {'type': 'number', 'multipleOf': 2}}},
+    {'properties': {'a': {'type': 'number', 'exclusiveMinimum': True}}},
+    {'properties': {'a': {'enum': [True, None]}}},
+    {'properties': {'a': {'pattern': '('}}},
+    {'additionalProperties': {'type': 'string'}},
+])
+def test_unsupported_schemata(schema):
+    with pytest.raises(UnsupportedSchemaError):
+        codegen.generate_source(schema)
+
+
+def test_unsupported_schema_falls_back(cache_dir):
+    schema = {'properties': {'a': {'type': 'number', 'multipleOf': 2}}}
+    validator = CompiledJsonSchemaValidator(schema, 1000, cache_dir)
+    assert not validator.compiled
+    assert validator.check_line({'a': '4'}) == []
+    assert validator.check_line({'a': '3'}) == ['3.0 is not a multiple of 2']
+
+
+def test_generated_code_is_cached(cache_dir):
+    codegen.load_check_function(SCHEMA, cache_dir)
+    assert os.listdir(cache_dir) == [f'schema_{codegen.schema_hash(SCHEMA)}.py']
+
+    with mock.patch('csvmodel.codegen.generate_source') as m:
+        codegen.load_check_function(SCHEMA, cache_dir)
+    m.assert_not_called()
+
+
+def test_works_without_writable_cache(tmp_path):
+    cache_dir = tmp_path / 'file'
+    cache_dir.write_text('not a directory')
+    check = codegen.load_check_function(SCHEMA, str(cache_dir))
+    assert check({'Employee': 'Fred', 'Salary': '1'})
+
+
+def test_default_cache_dir():
+    with mock.patch.dict(os.environ, {'CSVMODEL_CACHE_DIR': 'any_dir'}):
+        assert codegen.default_cache_dir() == 'any_dir'
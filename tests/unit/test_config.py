@@ -1,9 +1,12 @@
+import pytest
 from unittest import mock
 from io import StringIO
+import re
 
 from csvmodel.types import SchemaSpec, SchemaSpecType
+from csvmodel.errors import ConfigError
 
-from csvmodel.config import Config, find_config_file
+from csvmodel.config import Config, find_config_file, glob_to_regex
 
 
 def test_default_parses_schema_correctly():
@@ -100,3 +103,130 @@ class TestFindConfigFile:
             m.return_value = False
 
             assert find_config_file(None) is None
+
+
+class TestGlobSections:
+    @pytest.fixture
+    def config(self):
+        return Config(StringIO('\n'.join([
+            '[csvmodel:data/special.csv]',
+            'separator = |',
+            '',
+            '[csvmodel:data/**/*.csv]',
+            'separator = ;',
+            '',
+            '[csvmodel:**/*.tsv]',
+            'separator = ~',
+            '',
+            '[csvmodel:data/*]',
+            'separator = :',
+        ])))
+
+    def test_exact_section_wins(self, config):
+        assert config.separator('data/special.csv') == '|'
+
+    def test_double_star_matches_zero_directories(self, config):
+        assert config.separator('data/any_file.csv') == ';'
+
+    def test_double_star_matches_nested_directories(self, config):
+        assert config.separator('data/a/b/any_file.csv') == ';'
+
+    def test_first_matching_pattern_wins(self, config):
+        assert config.separator('data/any_file.tsv') == '~'
+        assert config.separator('data/any_file.txt') == ':'
+
+    def test_single_star_does_not_cross_directories(self, config):
+        assert config.separator('data/a/any_file.txt') == ','
+
+    def test_paths_are_normalized(self, config):
+        assert config.separator('./data/a/../any_file.csv') == ';'
+
+    def test_exact_section_wins_for_unnormalized_paths(self, config):
+        assert config.separator('./data/special.csv') == '|'
+        assert config.separator('data//special.csv') == '|'
+
+    def test_no_match_falls_back_to_defaults(self, config):
+        assert config.separator('other/any_file.csv') == ','
+
+
+@pytest.mark.parametrize('pattern,filename,matches', [
+    ('*.csv', 'a.csv', True),
+    ('*.csv', 'dir/a.csv', False),
+    ('**/*.csv', 'dir/a.csv', True),
+    ('**', 'dir/sub/a.csv', True),
+    ('file?.csv', 'file1.csv', True),
+    ('file?.csv', 'file12.csv', False),
+    ('file[0-9].csv', 'file1.csv', True),
+    ('file[!0-9].csv', 'file1.csv', False),
+    ('file[!0-9].csv', 'filea.csv', True),
+    ('a+b.csv', 'a+b.csv', True),
+])
+def test_glob_to_regex(pattern, filename, matches):
+    assert (re.fullmatch(glob_to_regex(pattern), filename) is not None) == matches
+
+
+def test_read_ahead():
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:big_file]',
+        'read-ahead = 4',
+    ])))
+    assert config.read_ahead('any_file') == 0
+    assert config.read_ahead('big_file') == 4
+
+
+def test_max_errors():
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:any_file]',
+        'max-errors = 3',
+    ])))
+    assert config.max_errors('any_file') == 3
+    assert config.max_errors('other_file') > 1_000_000_000_000
+
+
+@pytest.mark.parametrize('value,expected', [
+    ('infinite', None),
+    ('200ms', 0.2),
+    ('2s', 2.0),
+    ('1.5', 1.5),
+])
+def test_time_budget(value, expected):
+    config = Config(StringIO('\n'.join([
+        '[csvmodel]',
+        f'time-budget = {value}',
+    ])))
+    assert config.time_budget('any_file') == expected
+
+
+def test_discriminator_schemas():
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:feed.csv]',
+        'discriminator = record_type',
+        'schemas =',
+        '    order -> file:order.json',
+        '    refund -> inline:{"type": "object"}',
+    ])))
+    assert config.discriminator('feed.csv') == 'record_type'
+    assert config.schemas('feed.csv') == {
+        'order': SchemaSpec(type=SchemaSpecType.file, details='order.json'),
+        'refund': SchemaSpec(type=SchemaSpecType.inline, details='{"type": "object"}'),
+    }
+    assert config.discriminator('any_file') is None
+    assert config.schemas('any_file') == {}
+
+
+def test_invalid_discriminator_schemas():
+    config = Config(StringIO('\n'.join([
+        '[csvmodel]',
+        'schemas = file:order.json',
+    ])))
+    with pytest.raises(ConfigError):
+        config.schemas('any_file')
+
+
+def test_exact_section_names_are_normalized():
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:./data//any_file.csv]',
+        'separator = ;',
+    ])))
+    assert config.separator('data/any_file.csv') == ';'
+    assert config.separator('./data/any_file.csv') == ';'
@@ -0,0 +1,261 @@
+import pytest
+from unittest import mock
+
+from io import StringIO
+
+from csvmodel import errors
+from csvmodel.config import Config
+from csvmodel.constraints import (
+    BloomFilter, ForeignKeyConstraint, KeyStore, ReferenceIndex, ReferenceIndexes,
+    UniqueConstraint, constraints_for, hash_key,
+)
+from csvmodel.types import Reference
+from csvmodel.csvfile import CsvFile
+from csvmodel.validator import JsonSchemaValidator
+
+
+class TestUniqueConstraint:
+    def test_duplicates_point_to_first_occurrence(self):
+        constraint = UniqueConstraint(['id'])
+        assert constraint.check_row(2, {'id': '1'}) == []
+        assert constraint.check_row(3, {'id': '2'}) == []
+        assert constraint.check_row(4, {'id': '1'}) == [
+            'Duplicate value for column id, first seen in line 2',
+        ]
+        assert constraint.check_row(5, {'id': '1'}) == [
+            'Duplicate value for column id, first seen in line 2',
+        ]
+
+    def test_empty_values_are_ignored(self):
+        constraint = UniqueConstraint(['id'])
+        assert constraint.check_row(2, {'id': ''}) == []
+        assert constraint.check_row(3, {}) == []
+        assert constraint.check_row(4, {'id': ''}) == []
+
+    def test_composite_primary_key(self):
+        constraint = UniqueConstraint(['id', 'date'], primary_key=True)
+        assert constraint.check_row(2, {'id': '1', 'date': '2022-01-01'}) == []
+        assert constraint.check_row(3, {'id': '1', 'date': '2022-01-02'}) == []
+        assert constraint.check_row(4, {'id': '1', 'date': '2022-01-01'}) == [
+            'Duplicate value for primary key (id, date), first seen in line 2',
+        ]
+
+    def test_primary_key_needs_values(self):
+        constraint = UniqueConstraint(['id', 'date'], primary_key=True)
+        assert constraint.check_row(2, {'id': ''}) == [
+            'Empty value in primary key column id',
+            'Empty value in primary key column date',
+        ]
+
+
+class TestKeyStore:
+    def test_spills_to_disk(self):
+        store = KeyStore(memory_limit=10)
+        for i in range(100):
+            assert store.first_seen(hash_key([str(i)]), i) is None
+        assert len(store) < 10
+
+        for i in range(100):
+            assert store.first_seen(hash_key([str(i)]), 1000) == i
+        store.close()
+
+    def test_keys_are_merged_into_sorted_arrays(self):
+        store = KeyStore()
+        for i in range(5000):
+            assert store.first_seen(hash_key([str(i)]), i) is None
+        assert len(store) == 5000
+        assert len(store._recent) <= 1024
+        assert list(store._keys) == sorted(store._keys)
+
+        for i in range(5000):
+            assert store.first_seen(hash_key([str(i)]), 9999) == i
+        store.close()
+
+    def test_bloom_filter_avoids_lookups(self):
+        store = KeyStore(memory_limit=10)
+        for i in range(10):
+            store.first_seen(hash_key([str(i)]), i)
+        assert store._db is not None
+
+        with mock.patch.object(store, '_db') as db:
+            for i in range(10, 15):
+                store.first_seen(hash_key([str(i)]), i)
+        assert db.execute.call_count < 5
+        store.close()
+
+    def test_bloom_filter_grows_with_spilled_keys(self):
+        store = KeyStore(memory_limit=1000)
+        for i in range(5000):
+            store.first_seen(hash_key([str(i)]), i)
+        assert store._bloom is not None
+        false_positives = sum(
+            hash_key([str(i)]) in store._bloom for i in range(5000, 25000)
+        )
+        assert false_positives < 0.01 * 20000
+        assert store.first_seen(hash_key(['17']), 6000) == 17
+        store.close()
+
+    def test_bloom_filter_size_is_limited(self):
+        store = KeyStore(memory_limit=10)
+        for i in range(2000):
+            store.first_seen(hash_key([str(i)]), i)
+        assert store._bloom is not None
+        # No more memory than the 10 keys and lines in memory
+        assert len(store._bloom._bits) <= 10 * 16
+        assert store.first_seen(hash_key(['1999']), 3000) == 1999
+        assert store.first_seen(hash_key(['2000']), 3000) is None
+        store.close()
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1024)
+    keys = [hash_key([str(i)]) for i in range(50)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert sum(hash_key([str(i)]) in bloom for i in range(50, 1050)) < 50
+
+
+def test_constraints_for():
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:any_file]',
+        'unique = email, phone',
+        'primary-key = id, date',
+    ])))
+    constraints = constraints_for(config, 'any_file')
+    assert [c.description for c in constraints] == [
+        'column email',
+        'column phone',
+        'primary key (id, date)',
+    ]
+    assert constraints_for(config, 'other_file') == []
+
+
+@pytest.fixture
+def raw_csv():
+    with mock.patch('csvmodel.csvfile.open') as m:
+        yield m.return_value.__enter__
+
+
+def test_constraints_are_checked_with_rows(raw_csv):
+    raw_csv.return_value = [
+        'id,value',
+        '1,a',
+        '2,1',
+        '1,b',
+    ]
+    validator = JsonSchemaValidator(
+        {'type': 'object', 'properties': {'value': {'type': 'number'}}},
+        line_limit=1000,
+    )
+    constraint = UniqueConstraint(['id'])
+    with mock.patch.object(constraint, 'close') as close:
+        res = validator.check(CsvFile('any_file.csv'), constraints=[constraint])
+    close.assert_called_once()
+    assert res.messages == [
+        "any_file.csv:2: 'a' is not of type 'number'",
+        "any_file.csv:4: 'b' is not of type 'number'",
+        'any_file.csv:4: Duplicate value for column id, first seen in line 2',
+    ]
+
+
+@pytest.mark.parametrize('constraint', [
+    UniqueConstraint(['idd']),
+    UniqueConstraint(['id', 'idd'], primary_key=True),
+    ForeignKeyConstraint(
+        Reference.from_string('idd -> other.csv:id'), ReferenceIndex([]),
+    ),
+])
+def test_constraints_with_unknown_columns(raw_csv, constraint):
+    raw_csv.return_value = ['id,value', '1,a', '1,b']
+    validator = JsonSchemaValidator({'type': 'object'}, line_limit=1000)
+    with pytest.raises(errors.ConfigError, match='No column idd in any_file.csv'):
+        validator.check(CsvFile('any_file.csv'), constraints=[constraint])
+
+
+def test_constraints_see_rows_outside_of_lines(raw_csv):
+    raw_csv.return_value = [
+        'id,value',
+        '1,a',
+        '2,1',
+        '1,b',
+    ]
+    validator = JsonSchemaValidator(
+        {'type': 'object', 'properties': {'value': {'type': 'number'}}},
+        line_limit=1000,
+    )
+    res = validator.check(
+        CsvFile('any_file.csv'), lines=[(4, 4)], constraints=[UniqueConstraint(['id'])],
+    )
+    assert res.messages == [
+        "any_file.csv:4: 'b' is not of type 'number'",
+        'any_file.csv:4: Duplicate value for column id, first seen in line 2',
+    ]
+
+
+class TestReferences:
+    @pytest.fixture
+    def files(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'customers.csv').write_text('id;name\n1;Fred\n2;Tina\n;Jim\n')
+        return tmp_path
+
+    @pytest.fixture
+    def config(self, files):
+        return Config(StringIO('\n'.join([
+            '[csvmodel:customers.csv]',
+            'separator = ;',
+            '[csvmodel:orders.csv]',
+            'references = customer_id -> customers.csv:id',
+            '[csvmodel:returns.csv]',
+            'references =',
+            '    customer_id -> ./customers.csv:id',
+            '    order_id -> orders.csv:id',
+        ])))
+
+    def test_index(self, files):
+        index = ReferenceIndex.from_file(CsvFile('customers.csv', ';'), 'id')
+        assert len(index) == 2
+        assert hash_key(['1']) in index
+        assert hash_key(['3']) not in index
+
+    def test_index_for_missing_column(self, files):
+        with pytest.raises(errors.ConfigError):
+            ReferenceIndex.from_file(CsvFile('customers.csv', ';'), 'customer')
+
+    def test_foreign_key(self, config):
+        constraint, = constraints_for(config, 'orders.csv')
+        assert constraint.check_row(2, {'customer_id': '1'}) == []
+        assert constraint.check_row(3, {'customer_id': ''}) == []
+        assert constraint.check_row(4, {'customer_id': '3'}) == [
+            "Value '3' of column customer_id not found in column id of customers.csv",
+        ]
+
+    def test_indexes_are_shared(self, config, files):
+        (files / 'orders.csv').write_text('id,customer_id\n1,1\n')
+        indexes = ReferenceIndexes(config)
+        with mock.patch(
+            'csvmodel.constraints.ReferenceIndex.from_file',
+            wraps=ReferenceIndex.from_file,
+        ) as m:
+            constraints_for(config, 'orders.csv', indexes)
+            constraints_for(config, 'returns.csv', indexes)
+        assert m.call_count == 2
+
+    def test_missing_referenced_file(self, config):
+        with pytest.raises(errors.ConfigError):
+            constraints_for(config, 'returns.csv')
+
+
+@pytest.mark.parametrize('spec,expected', [
+    ('a -> b.csv:c', Reference(column='a', target='b.csv', target_column='c')),
+    ('a->dir/b.csv:c', Reference(column='a', target='dir/b.csv', target_column='c')),
+])
+def test_parse_reference(spec, expected):
+    assert Reference.from_string(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['a', 'a -> b.csv', 'a -> b.csv:', '-> b.csv:c'])
+def test_parse_invalid_reference(spec):
+    with pytest.raises(errors.ConfigError):
+        Reference.from_string(spec)
@@ -1,7 +1,9 @@
 import pytest
 from unittest import mock
+import os
+import threading
 
-from csvmodel.csvfile import CsvFile
+from csvmodel.csvfile import ENCODING, CsvFile, LineIndex, iter_filenames
 
 
 @pytest.fixture
@@ -22,3 +24,128 @@ def test_strip_whitespace(mock_open):
         ['some', 'line', 'with', 'stuff', ''],
         ['other', 'line', 'with', 'stuff', ''],
     ]
+
+
+def test_iter_filenames_walks_directories(tmp_path):
+    for name in [
+        'b.csv',
+        'a.csv',
+        'notes.txt',
+        'sub/c.csv',
+        '.hidden/d.csv',
+    ]:
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text('col1\n')
+
+    explicit = str(tmp_path / 'notes.txt')
+    assert list(iter_filenames([str(tmp_path), explicit])) == [
+        str(tmp_path / 'a.csv'),
+        str(tmp_path / 'b.csv'),
+        str(tmp_path / 'sub' / 'c.csv'),
+        explicit,
+    ]
+
+
+class TestReadAhead:
+    @pytest.fixture
+    def rows(self, mock_open):
+        mock_open.return_value.__enter__.return_value = [
+            f'{i},line{i}\n' for i in range(25)
+        ]
+        return [[str(i), f'line{i}'] for i in range(25)]
+
+    def test_same_rows_as_sequential(self, rows):
+        csv_file = CsvFile('any_file', ',', read_ahead=2, batch_size=4)
+        assert list(csv_file.iter_rows()) == rows
+
+    def test_stopping_early_stops_reader(self, rows):
+        csv_file = CsvFile('any_file', ',', read_ahead=1, batch_size=2)
+        it = csv_file.iter_rows()
+        assert [next(it) for _ in range(3)] == rows[:3]
+        it.close()
+        assert threading.active_count() == 1
+
+    def test_errors_are_raised_in_consumer(self, mock_open):
+        mock_open.side_effect = FileNotFoundError('any_file')
+        csv_file = CsvFile('any_file', ',', read_ahead=2)
+        with pytest.raises(FileNotFoundError):
+            list(csv_file.iter_rows())
+
+
+class TestLineIndex:
+    @pytest.fixture
+    def filename(self, tmp_path):
+        path = tmp_path / 'data.csv'
+        path.write_text('id,value\n' + ''.join(f'{i},{"x"*i}\n' for i in range(1, 26)))
+        return str(path)
+
+    def read_all(self, filename, **kwargs):
+        return list(CsvFile(filename, ',', **kwargs).iter_rows())
+
+    def test_index_is_built_while_reading(self, filename):
+        assert LineIndex.load(filename) is None
+        rows = self.read_all(filename, index_step=4)
+        assert rows == self.read_all(filename)
+
+        index = LineIndex.load(filename)
+        assert index is not None
+        assert index.step == 4
+        assert len(index.offsets) == 7
+        with open(filename, 'rb') as f:
+            for i, offset in enumerate(index.offsets):
+                f.seek(offset)
+                assert f.readline().decode().strip().split(',') == rows[4 * i]
+
+    def test_index_is_not_built_when_stopping_early(self, filename):
+        rows = CsvFile(filename, ',', index_step=4).iter_rows()
+        next(rows)
+        rows.close()
+        assert LineIndex.load(filename) is None
+
+    def test_index_is_not_rebuilt(self, filename):
+        self.read_all(filename, index_step=4)
+        with mock.patch('csvmodel.csvfile.LineIndex.save') as m:
+            self.read_all(filename, index_step=4)
+        m.assert_not_called()
+
+    def test_index_is_invalidated(self, filename):
+        self.read_all(filename, index_step=4)
+        with open(filename, 'a') as f:
+            f.write('26,y\n')
+        assert LineIndex.load(filename) is None
+
+    def test_index_is_hidden(self, filename):
+        self.read_all(filename, index_step=4)
+        assert list(iter_filenames([os.path.dirname(filename)])) == [filename]
+
+    @pytest.mark.parametrize('use_index', [True, False])
+    @pytest.mark.parametrize('start,stop', [
+        (0, 1), (0, 3), (3, 9), (4, 8), (23, None), (25, 30), (30, None),
+    ])
+    def test_iter_range(self, filename, use_index, start, stop):
+        rows = self.read_all(filename, index_step=4 if use_index else 0)
+        csv_file = CsvFile(filename, ',')
+        assert list(csv_file.iter_range(start, stop)) == rows[start:stop]
+
+    def test_header(self, filename):
+        self.read_all(filename, index_step=4)
+        assert CsvFile(filename, ',').header() == ['id', 'value']
+
+    @pytest.mark.parametrize('content', [
+        'a,b\r1,x\r2,3\r',
+        'a,b\r\n1,x\r\n2,3\r\n',
+        'a,b\n1,\u00e4\u00f6\n2,3\n',
+    ])
+    def test_line_endings_and_encoding(self, tmp_path, content):
+        path = tmp_path / 'data.csv'
+        path.write_bytes(content.encode(ENCODING))
+        filename = str(path)
+
+        rows = self.read_all(filename)
+        assert len(rows) == 3
+        assert self.read_all(filename, index_step=1) == rows
+        assert LineIndex.load(filename) is not None
+        assert self.read_all(filename, index_step=1) == rows
+        for start in range(4):
+            assert list(CsvFile(filename, ',').iter_range(start)) == rows[start:]
@@ -27,3 +27,10 @@ def test_no_prefix():
         type='inline',
         details='{"type": "object"}',
     )
+
+
+def test_source():
+    assert SchemaSpec.from_string('file:model.py:AnyModel').source == 'model.py'
+    assert SchemaSpec.from_string('file:schema.json').source == 'schema.json'
+    assert SchemaSpec.from_string('module:any_module:AnyModel').source is None
+    assert SchemaSpec.from_string('{"type": "object"}').source is None
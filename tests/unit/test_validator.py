@@ -1,14 +1,19 @@
 import pytest
 from unittest import mock
 
+import itertools
 import os
 from pydantic import BaseModel, root_validator
 import tempfile
+import threading
 
 from csvmodel import errors
 from csvmodel.types import SchemaSpec, ValidationResult
-from csvmodel.csvfile import CsvFile
-from csvmodel.validator import get_validator, JsonSchemaValidator, PydanticValidator
+from csvmodel.csvfile import CsvFile, LineIndex
+from csvmodel.validator import (
+    get_validator, JsonSchemaValidator, PydanticValidator, ErrorBudget, ValidatorCache,
+    DispatchValidator, CursorOrder,
+)
 
 
 @pytest.fixture
@@ -372,3 +377,357 @@ class TestPydanticValidator:
             'any_file.csv:3: Issue in column col3: value is not a valid float',
             "any_file.csv:4: missing 1 required positional argument: 'col3'",
         ]
+
+
+def test_check_with_read_ahead(raw_csv):
+    raw_csv.return_value = ['col1,col2'] + ['a,1']*9 + ['a,a'] + ['a,1']*5
+    validator = JsonSchemaValidator(
+        {'type': 'object', 'properties': {'col2': {'type': 'integer'}}},
+        line_limit=1000,
+    )
+    res = validator.check(CsvFile('any_file.csv', read_ahead=2, batch_size=3))
+    assert res.messages == ["any_file.csv:11: 'a' is not of type 'integer'"]
+
+
+@pytest.mark.parametrize('cursor', [None, 50])
+def test_read_ahead_stops_when_stopping_early(tmp_path, cursor):
+    path = tmp_path / 'data.csv'
+    path.write_text('col1,col2\n' + 'a,a\n' * 1000)
+    validator = JsonSchemaValidator(
+        {'type': 'object', 'properties': {'col2': {'type': 'integer'}}},
+        line_limit=10_000,
+    )
+    res = validator.check(
+        CsvFile(str(path), read_ahead=2, batch_size=3),
+        max_errors=1,
+        deadline=None if cursor is None else 1e12,
+        cursor=cursor,
+    )
+    assert len(res.messages) == 1
+    # Without waiting for the garbage collector
+    assert not any('_fill_queue' in t.name for t in threading.enumerate())
+
+
+class TestErrorLimits:
+    @pytest.fixture
+    def validator(self):
+        return JsonSchemaValidator(
+            {'type': 'object', 'properties': {'col2': {'type': 'integer'}}},
+            line_limit=1000,
+        )
+
+    @pytest.fixture
+    def rows(self, raw_csv):
+        raw_csv.return_value = ['col1,col2'] + ['a,1', 'a,a']*5
+        return raw_csv
+
+    def test_max_errors_per_file(self, validator, rows):
+        res = validator.check(CsvFile('any_file.csv'), max_errors=2)
+        assert not res.ok
+        assert res.messages == [
+            "any_file.csv:3: 'a' is not of type 'integer'",
+            "any_file.csv:5: 'a' is not of type 'integer'",
+        ]
+
+    def test_stops_reading_at_max_errors(self, validator, rows):
+        checked = []
+        check_line = validator.check_line
+
+        def spy(record):
+            checked.append(record)
+            return check_line(record)
+
+        validator.check_line = spy
+        validator.check(CsvFile('any_file.csv'), max_errors=1)
+        assert len(checked) == 2
+
+    def test_budget_is_shared_between_files(self, validator, rows):
+        budget = ErrorBudget(3)
+        res1 = validator.check(CsvFile('file1.csv'), budget=budget)
+        res2 = validator.check(CsvFile('file2.csv'), budget=budget)
+        assert len(res1.messages) == 3
+        assert res2.messages == []
+        assert budget.exhausted
+
+    def test_budget_truncates_multiple_errors_per_line(self, rows):
+        class Data(BaseModel):
+            col1: int
+            col2: int
+
+        validator = PydanticValidator(Data, line_limit=1000)
+        res = validator.check(CsvFile('any_file.csv'), budget=ErrorBudget(1))
+        assert not res.ok
+        assert res.messages == [
+            'any_file.csv:2: Issue in column col1: value is not a valid integer',
+        ]
+
+
+def test_error_budget_is_thread_safe():
+    budget = ErrorBudget(1000)
+
+    def take():
+        for _ in range(500):
+            budget.take(1)
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert budget.exhausted
+    assert budget.take(1) == 0
+
+
+def test_check_only_given_lines(raw_csv):
+    raw_csv.return_value = ['col1,col2'] + ['a,a']*10
+    validator = JsonSchemaValidator(
+        {'type': 'object', 'properties': {'col2': {'type': 'integer'}}},
+        line_limit=1000,
+    )
+    res = validator.check(CsvFile('any_file.csv'), lines=[(7, 7), (3, 4)])
+    assert res.messages == [
+        "any_file.csv:3: 'a' is not of type 'integer'",
+        "any_file.csv:4: 'a' is not of type 'integer'",
+        "any_file.csv:7: 'a' is not of type 'integer'",
+    ]
+
+    res = validator.check(CsvFile('any_file.csv'), lines=[])
+    assert res.ok
+
+
+class TestValidatorCache:
+    def test_reuses_validators(self, inlinespec):
+        validators = ValidatorCache()
+        validator = validators.get('jsonschema', inlinespec)
+        assert validators.get('jsonschema', inlinespec) is validator
+        assert validators.get('jsonschema', inlinespec, 10) is not validator
+
+    def test_invalidate(self, tmp_path):
+        schema_file = tmp_path / 'schema.json'
+        schema_file.write_text('{"type": "object"}')
+        spec = SchemaSpec(type='file', details=str(schema_file))
+
+        validators = ValidatorCache()
+        validator = validators.get('jsonschema', spec)
+        validators.invalidate(str(tmp_path / 'other.json'))
+        assert validators.get('jsonschema', spec) is validator
+        validators.invalidate(str(schema_file))
+        assert validators.get('jsonschema', spec) is not validator
+
+
+class TestTimeBudget:
+    @pytest.fixture
+    def validator(self):
+        return JsonSchemaValidator(
+            {'type': 'object', 'properties': {'col2': {'type': 'integer'}}},
+            line_limit=1000,
+        )
+
+    @pytest.fixture
+    def clock(self):
+        # Every call advances the clock by one second
+        with mock.patch('csvmodel.validator.time.monotonic') as m:
+            m.side_effect = range(1000)
+            yield m
+
+    def test_no_deadline(self, validator, raw_csv):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*5
+        res = validator.check(CsvFile('any_file.csv'))
+        assert res.complete
+        assert res.checked is None
+        assert len(res.messages) == 5
+
+    def test_stops_at_deadline(self, validator, raw_csv, clock):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*9
+        res = validator.check(CsvFile('any_file.csv'), deadline=2.5)
+        assert not res.complete
+        assert res.checked == (2, 4)
+        assert res.messages == [
+            "any_file.csv:2: 'a' is not of type 'integer'",
+            "any_file.csv:3: 'a' is not of type 'integer'",
+            "any_file.csv:4: 'a' is not of type 'integer'",
+        ]
+
+    def test_complete_within_deadline(self, validator, raw_csv, clock):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*3
+        res = validator.check(CsvFile('any_file.csv'), deadline=100)
+        assert res.complete
+        assert res.checked is None
+
+    def test_rows_around_cursor_first(self, validator, raw_csv):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*9
+        with mock.patch('csvmodel.validator.time.monotonic') as m:
+            # Reading the header and the rows up to the cursor takes no time
+            m.side_effect = itertools.chain([0]*7, itertools.count())
+            res = validator.check(CsvFile('any_file.csv'), deadline=3.5, cursor=6)
+        assert not res.complete
+        assert res.checked == (5, 7)
+        assert res.messages == [
+            "any_file.csv:5: 'a' is not of type 'integer'",
+            "any_file.csv:6: 'a' is not of type 'integer'",
+            "any_file.csv:7: 'a' is not of type 'integer'",
+        ]
+
+    def test_reading_to_cursor_uses_up_time(self, validator, raw_csv, clock):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*9
+        res = validator.check(CsvFile('any_file.csv'), deadline=2.5, cursor=9)
+        assert not res.complete
+        assert res.checked is None
+        assert res.messages == []
+
+    def test_cursor_complete_within_deadline(self, validator, raw_csv, clock):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*9
+        res = validator.check(CsvFile('any_file.csv'), deadline=1000, cursor=6)
+        assert res.complete
+        assert len(res.messages) == 9
+
+    def test_cursor_with_line_ranges(self, validator, raw_csv):
+        raw_csv.return_value = ['col1,col2'] + ['a,a']*9
+        res = validator.check(
+            CsvFile('any_file.csv'), lines=[(8, 9)], deadline=1e12, cursor=2,
+        )
+        assert res.messages == [
+            "any_file.csv:8: 'a' is not of type 'integer'",
+            "any_file.csv:9: 'a' is not of type 'integer'",
+        ]
+
+
+class TestCursorOrder:
+    def order(self, cursor, window, ranges=None, line_limit=1000):
+        return CursorOrder(
+            CsvFile('any_file.csv'), cursor, line_limit, 1e12, ranges, window,
+        )
+
+    def test_alternates_around_cursor(self, raw_csv):
+        raw_csv.return_value = ['h'] + [str(i) for i in range(1, 10)]
+        rows = [i for i, _ in self.order(5, window=10)]
+        assert rows == [0, 5, 4, 6, 3, 7, 2, 8, 1, 9]
+
+    def test_rereads_rows_before_window(self, raw_csv):
+        raw_csv.return_value = ['h'] + [str(i) for i in range(1, 10)]
+        order = self.order(7, window=2)
+        rows = [(i, content) for i, content in order]
+        assert [i for i, _ in rows] == [0, 7, 6, 8, 5, 9, 4, 3, 2, 1]
+        assert all(content == [str(i)] for i, content in rows[1:])
+        assert order.complete
+
+    def test_cursor_past_end(self, raw_csv):
+        raw_csv.return_value = ['h'] + [str(i) for i in range(1, 5)]
+        rows = [i for i, _ in self.order(100, window=2)]
+        assert rows == [0, 4, 3, 2, 1]
+
+    def test_line_limit(self, raw_csv):
+        raw_csv.return_value = ['h'] + [str(i) for i in range(1, 10)]
+        rows = [i for i, _ in self.order(5, window=10, line_limit=7)]
+        assert rows == [0, 5, 4, 6, 3, 2, 1]
+
+    def test_ranges(self, raw_csv):
+        raw_csv.return_value = ['h'] + [str(i) for i in range(1, 10)]
+        rows = [i for i, _ in self.order(5, window=10, ranges=[(4, 5), (9, 9)])]
+        assert rows == [0, 4, 3, 8]
+
+    def test_seeks_with_line_index(self, tmp_path):
+        path = tmp_path / 'data.csv'
+        path.write_text('h\n' + ''.join(f'{i}\n' for i in range(1, 10)))
+        list(CsvFile(str(path), index_step=2).iter_rows())
+        assert LineIndex.load(str(path)) is not None
+        order = CursorOrder(CsvFile(str(path)), 7, 1000, 1e12, None, 2)
+        rows = [(i, content) for i, content in order]
+        assert [i for i, _ in rows] == [0, 7, 6, 8, 5, 9, 4, 3, 2, 1]
+        assert all(content == [str(i)] for i, content in rows[1:])
+
+
+class TestDispatchValidator:
+    @pytest.fixture
+    def validator(self):
+        return DispatchValidator(
+            'record_type',
+            {
+                'order': JsonSchemaValidator(
+                    {'type': 'object', 'properties': {'amount': {'type': 'number'}}},
+                    line_limit=1000,
+                ),
+                'refund': JsonSchemaValidator(
+                    {'type': 'object', 'properties': {'amount': {'type': 'integer'}}},
+                    line_limit=1000,
+                ),
+            },
+            line_limit=1000,
+        )
+
+    def test_each_row_uses_its_schema(self, validator, raw_csv):
+        raw_csv.return_value = [
+            'record_type,amount',
+            'order,1.5',
+            'refund,1.5',
+            'refund,2',
+            'other,2',
+        ]
+        res = validator.check(CsvFile('any_file.csv'))
+        assert res.messages == [
+            "any_file.csv:3: '1.5' is not of type 'integer'",
+            "any_file.csv:5: No schema for record_type 'other'",
+        ]
+
+    def test_only_the_matching_validator_is_called(self, validator):
+        with mock.patch.object(validator._validators['refund'], 'check_line') as m:
+            validator.check_line({'record_type': 'order', 'amount': '1'})
+        m.assert_not_called()
+
+    def test_cache_shares_validators(self, inlinespec):
+        validators = ValidatorCache()
+        dispatch = validators.get_dispatch(
+            'jsonschema', 'record_type', {'a': inlinespec, 'b': inlinespec},
+        )
+        assert dispatch._validators['a'] is validators.get('jsonschema', inlinespec)
+        assert dispatch._validators['b'] is dispatch._validators['a']
+
+
+class TestPydanticValidateOnly:
+    @pytest.fixture
+    def model(self):
+
+        class Data(BaseModel):
+            col1: str
+            col2: int
+            col3: float
+
+            @root_validator(pre=False, skip_on_failure=True, allow_reuse=True)
+            def positive(cls, values):
+                if values['col2'] < 0:
+                    raise ValueError('col2 should be positive')
+                return values
+
+        return Data
+
+    @pytest.mark.parametrize('record', [
+        {'col1': 'a', 'col2': '1', 'col3': '1.5'},
+        {'col1': 'a', 'col2': '1.1', 'col3': 'a'},
+        {'col1': 'a', 'col2': '1'},
+        {'col1': 'a', 'col2': '-1', 'col3': '1'},
+        {'col1': 'a', 'col2': '1', 'col3': '1', 'col4': 'x'},
+    ])
+    def test_same_messages_as_instantiating(self, model, record):
+        validator = PydanticValidator(model, line_limit=1000)
+        assert validator._validate_only
+
+        expected = PydanticValidator(model, line_limit=1000)
+        expected._validate_only = False
+        assert validator.check_line(record) == expected.check_line(record)
+
+    def test_does_not_create_instances(self, model):
+        validator = PydanticValidator(model, line_limit=1000)
+        with mock.patch.object(model, '__init__') as m:
+            assert validator.check_line({'col1': 'a', 'col2': '1', 'col3': '1'}) == []
+        m.assert_not_called()
+
+    def test_custom_init_is_respected(self):
+
+        class Data(BaseModel):
+            col1: int
+
+            def __init__(self, **data):
+                super().__init__(**data)
+
+        assert not PydanticValidator(Data, line_limit=1000)._validate_only
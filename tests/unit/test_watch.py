@@ -0,0 +1,106 @@
+import pytest
+from unittest import mock
+
+import os
+from io import StringIO
+
+from csvmodel.config import Config
+from csvmodel.validator import ValidatorCache
+from csvmodel.watch import Watcher
+
+
+def touch(path, mtime):
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('data')
+    for name in ['data/a.csv', 'data/b.csv', 'data/c.csv']:
+        with open(name, 'w') as f:
+            f.write('col1\n1\n')
+        touch(name, 1)
+    with open('schema.json', 'w') as f:
+        f.write('{"type": "object"}')
+    touch('schema.json', 1)
+    return tmp_path
+
+
+@pytest.fixture
+def watcher(files):
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:data/a.csv]',
+        'schema = file:schema.json',
+        '[csvmodel:data/b.csv]',
+        'schema = file:schema.json',
+    ])))
+    return Watcher(['data'], config, mock.Mock(ValidatorCache), interval=0)
+
+
+def test_nothing_changed(watcher):
+    assert watcher.poll() == []
+
+
+def test_modified_csv_file(watcher):
+    touch('data/c.csv', 2)
+    assert watcher.poll() == ['data/c.csv']
+    assert watcher.poll() == []
+    watcher.validators.invalidate.assert_not_called()
+
+
+def test_new_csv_file(watcher):
+    with open('data/d.csv', 'w') as f:
+        f.write('col1\n')
+    assert watcher.poll() == ['data/d.csv']
+
+
+def test_modified_schema_file(watcher):
+    touch('schema.json', 2)
+    assert watcher.poll() == ['data/a.csv', 'data/b.csv']
+    watcher.validators.invalidate.assert_called_once_with('schema.json')
+
+
+def test_wait_returns_changed_files(watcher):
+    with mock.patch.object(watcher, 'poll') as m:
+        m.side_effect = [[], [], ['data/a.csv']]
+        assert watcher.wait() == ['data/a.csv']
+
+
+def test_modified_discriminator_schema(files):
+    with open('refund.json', 'w') as f:
+        f.write('{"type": "object"}')
+    touch('refund.json', 1)
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:data/c.csv]',
+        'discriminator = record_type',
+        'schemas =',
+        '    order -> file:schema.json',
+        '    refund -> file:refund.json',
+    ])))
+    watcher = Watcher(['data'], config, mock.Mock(ValidatorCache), interval=0)
+
+    touch('refund.json', 2)
+    assert watcher.poll() == ['data/c.csv']
+    watcher.validators.invalidate.assert_called_once_with('refund.json')
+
+
+def test_modified_referenced_file(files):
+    with open('customers.csv', 'w') as f:
+        f.write('id\n1\n')
+    touch('customers.csv', 1)
+    config = Config(StringIO('\n'.join([
+        '[csvmodel:data/a.csv]',
+        'references = col1 -> customers.csv:id',
+        '[csvmodel:data/b.csv]',
+        'references = col1 -> data/c.csv:col1',
+    ])))
+    watcher = Watcher(['data'], config, mock.Mock(ValidatorCache), interval=0)
+
+    touch('customers.csv', 2)
+    assert watcher.poll() == ['data/a.csv']
+
+    # A referenced file that is watched itself is checked again as well
+    touch('data/c.csv', 2)
+    assert watcher.poll() == ['data/b.csv', 'data/c.csv']
+    watcher.validators.invalidate.assert_not_called()